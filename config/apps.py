@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class ConfigConfig(AppConfig):
+    """Приложение проекта: общие для всех приложений команды управления (схема API, замеры производительности)."""
+
+    name = 'config'
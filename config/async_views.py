@@ -0,0 +1,106 @@
+import inspect
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist, ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+
+class AsyncAPIView:
+    """Асинхронная обработка запроса для представлений DRF. Аутентификация, чтение объектов и страниц выполняются
+    асинхронными запросами ORM, поэтому под ASGI-сервером один процесс обслуживает много одновременных запросов без
+    потока на каждый. Проверки прав, согласование формата и сериализация остаются синхронными: они не обращаются к
+    базе данных, если связанные объекты загружены заранее (метод <aprepare>). Классы аутентификации должны
+    поддерживать метод <aauthenticate>. Ставится первым в списке базовых классов представления."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request):
+        for authenticator in request.authenticators:
+            if not hasattr(authenticator, 'aauthenticate'):
+                raise ImproperlyConfigured(f'{type(authenticator).__name__} не поддерживает асинхронную '
+                                           f'аутентификацию.')
+            try:
+                user_auth = await authenticator.aauthenticate(request)
+            except Exception:
+                request._authenticator = None
+                request.user, request.auth = AnonymousUser(), None
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._authenticator = None
+        request.user, request.auth = AnonymousUser(), None
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aprepare(self, objects):
+        """Метод загружает связанные объекты, которые понадобятся сериализатору."""
+
+
+class AsyncListModelMixin:
+    """Асинхронный вывод списка. Ставится последним в списке базовых классов, чтобы ConditionalListMixin мог
+    дополнить метод <alist>."""
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        objects = page if page is not None else [obj async for obj in queryset]
+        await self.aprepare(objects)
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class AsyncRetrieveModelMixin:
+    """Асинхронный вывод объекта."""
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        await self.aprepare([instance])
+        return Response(self.get_serializer(instance).data)
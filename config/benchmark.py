@@ -0,0 +1,108 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connections
+from django.test import AsyncClient, Client
+
+
+def summarize(latencies, elapsed):
+    """Функция возвращает сводку замера: количество запросов в секунду и задержки p50/p95 в миллисекундах."""
+
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': p95 * 1000,
+    }
+
+
+def run_sync(path, headers, requests, concurrency):
+    """Функция выполняет <requests> запросов к синхронному обработчику (WSGI) в <concurrency> потоках."""
+
+    local = threading.local()
+
+    def request(_):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        started = time.perf_counter()
+        response = local.client.get(path, headers=headers)
+        latency = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{path}: {response.status_code}')
+        return latency
+
+    def close(_):
+        connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(request, range(requests)))
+        list(executor.map(close, range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_async(path, headers, requests, concurrency):
+    """Функция выполняет <requests> запросов к асинхронному обработчику (ASGI), не больше <concurrency>
+    одновременно, в одном потоке."""
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latency = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f'{path}: {response.status_code}')
+            return latency
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(requests)))
+        return summarize(latencies, time.perf_counter() - started)
+
+    return asyncio.run(main())
+
+
+def run_render(renderer, data, repeats):
+    """Функция <repeats> раз кодирует <data> рендерером <renderer> и возвращает сводку замера и размер ответа в
+    байтах."""
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        render_started = time.perf_counter()
+        body = renderer.render(data, renderer.media_type, {})
+        latencies.append(time.perf_counter() - render_started)
+    return {**summarize(latencies, time.perf_counter() - started), 'size': len(body)}
+
+
+def run_connections(using, requests, conn_max_age):
+    """Функция выполняет <requests> имитаций запроса HTTP с одним запросом SELECT 1 к базе данных <using>. До и после
+    каждого запроса вызывается close_old_connections, как по сигналам request_started и request_finished, поэтому
+    соединение закрывается или сохраняется по значению <conn_max_age> так же, как при обработке запросов."""
+
+    connection = connections[using]
+    saved = connection.settings_dict['CONN_MAX_AGE']
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            close_old_connections()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            close_old_connections()
+            latencies.append(time.perf_counter() - request_started)
+    finally:
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = saved
+    return summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,57 @@
+from hashlib import md5
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalListMixin:
+    """Поддержка условных GET-запросов для списков. ETag и Last-Modified вычисляются одним агрегирующим запросом
+    (количество объектов и наибольшие значения полей <conditional_fields>) по отфильтрованной выборке без
+    сериализации. Если у клиента актуальная версия (If-None-Match или If-Modified-Since), возвращается ответ 304.
+    ETag учитывает адрес запроса с параметрами и формат ответа; удаление объекта меняет ETag через количество, но не
+    Last-Modified."""
+
+    conditional_fields = ('updated_at',)
+
+    def get_conditional_aggregates(self):
+        return {'count': Count('pk'),
+                **{f'field_{index}': Max(field) for index, field in enumerate(self.conditional_fields)}}
+
+    def get_conditional_state(self, request, state):
+        """Метод возвращает пару (ETag, время последнего изменения) по результату агрегирующего запроса <state>."""
+
+        values = [state[f'field_{index}'] for index in range(len(self.conditional_fields))]
+        last_modified = max((value for value in values if value is not None), default=None)
+        version = ':'.join([
+            str(state['count']),
+            *(value.isoformat() if value is not None else '' for value in values),
+            request.get_full_path(),
+            request.accepted_media_type or '',
+        ])
+        timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+        return quote_etag(md5(version.encode()).hexdigest()), timestamp
+
+    @staticmethod
+    def set_conditional_headers(response, etag, timestamp):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        etag, timestamp = self.get_conditional_state(request, queryset.aggregate(**self.get_conditional_aggregates()))
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            return response
+        return self.set_conditional_headers(super().list(request, *args, **kwargs), etag, timestamp)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        state = await queryset.aaggregate(**self.get_conditional_aggregates())
+        etag, timestamp = self.get_conditional_state(request, state)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            return response
+        return self.set_conditional_headers(await super().alist(request, *args, **kwargs), etag, timestamp)
@@ -0,0 +1,88 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """Маршрутизатор чтения на реплики. Чтение идет в базу данных, выбранную для текущего запроса в <read_database>
+    (ее устанавливает ReplicaMiddleware), а без выбора — в основную базу данных; запись всегда идет в основную.
+    Реплики перечисляются в настройке DATABASE_REPLICAS, миграции к ним не применяются."""
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+@contextmanager
+def use_primary():
+    """Контекстный менеджер: чтение внутри блока идет в основную базу данных."""
+
+    token = read_database.set(None)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def get_writer_key(request):
+    """Функция возвращает ключ кэша, по которому запрос закрепляется за основной базой данных после записи: по
+    пользователю из токена JWT или по сессии. Токен только проверяется, без запроса к базе данных."""
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is not None:
+        try:
+            token = authentication.get_validated_token(raw_token)
+            return f'db:primary:user:{token[api_settings.USER_ID_CLAIM]}'
+        except (InvalidToken, TokenError, KeyError):
+            return None
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f'db:primary:session:{session_key}' if session_key else None
+
+
+def choose_read_database(request, pinned):
+    """Функция выбирает базу данных чтения запроса: случайную реплику для безопасных методов, если автор запроса
+    недавно ничего не записывал, иначе основную (None)."""
+
+    if request.method not in SAFE_METHODS or pinned or not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def pin_to_primary(request, key):
+    """Функция после запроса на запись закрепляет автора за основной базой данных на READ_YOUR_WRITES_TIMEOUT
+    секунд, чтобы следующие чтения видели записанное до того, как изменения дойдут до реплик."""
+
+    if key is not None and request.method not in SAFE_METHODS:
+        cache.set(key, True, settings.READ_YOUR_WRITES_TIMEOUT)
+
+
+async def apin_to_primary(request, key):
+    """Асинхронный вариант pin_to_primary."""
+
+    if key is not None and request.method not in SAFE_METHODS:
+        await cache.aset(key, True, settings.READ_YOUR_WRITES_TIMEOUT)
@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from config.benchmark import run_connections
+
+
+class Command(BaseCommand):
+    help = ('Сравнение стоимости запроса с новым соединением для каждого запроса (CONN_MAX_AGE=0) и с постоянным '
+            'соединением: каждый запрос HTTP имитируется одним запросом SELECT 1 с обработкой сигналов начала и '
+            'конца запроса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--conn-max-age', type=int,
+                            help='Время жизни постоянного соединения, по умолчанию CONN_MAX_AGE из настроек или 60.')
+
+    def handle(self, *args, **options):
+        conn_max_age = options['conn_max_age'] or connections[options['database']].settings_dict['CONN_MAX_AGE'] or 60
+        results = {}
+        self.stdout.write(f'{"CONN_MAX_AGE":<16}{"запросов":>10}{"rps":>10}{"p50, мс":>10}{"p95, мс":>10}')
+        for age in (0, conn_max_age):
+            results[age] = run_connections(options['database'], options['requests'], age)
+            self.stdout.write(f'{age:<16}{results[age]["requests"]:>10}{results[age]["rps"]:>10.1f}'
+                              f'{results[age]["p50"]:>10.2f}{results[age]["p95"]:>10.2f}')
+        saving = results[0]['p50'] - results[conn_max_age]['p50']
+        self.stdout.write(f'Экономия на запрос (p50): {saving:.2f} мс')
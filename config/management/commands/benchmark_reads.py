@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.benchmark import run_async, run_sync
+from users.models import User
+
+READ_PATHS = (
+    ('/sales/', '/sales/async/'),
+    ('/products/', '/products/async/'),
+    ('/contacts/', '/contacts/async/'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение синхронных и асинхронных представлений чтения: запросы выполняются внутри процесса через '
+            'обработчики WSGI (в потоках) и ASGI (в одном цикле событий) от имени пользователя <--user>.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Email пользователя, от имени которого выполняются запросы.')
+        parser.add_argument('--sale', type=int, help='id звена для замера детальной информации.')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--accept', default='application/json',
+                            help='Формат ответа, например application/msgpack.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f'Пользователь {options["user"]} не найден.')
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}', 'Accept': options['accept']}
+        paths = list(READ_PATHS)
+        if options['sale']:
+            paths.append((f'/sales/{options["sale"]}/', f'/sales/async/{options["sale"]}/'))
+
+        self.stdout.write(f'{"путь":<28}{"режим":<8}{"запросов":>10}{"rps":>10}{"p50, мс":>10}{"p95, мс":>10}')
+        for sync_path, async_path in paths:
+            for mode, path, runner in (('sync', sync_path, run_sync), ('async', async_path, run_async)):
+                result = runner(path, headers, options['requests'], options['concurrency'])
+                self.stdout.write(f'{path:<28}{mode:<8}{result["requests"]:>10}{result["rps"]:>10.1f}'
+                                  f'{result["p50"]:>10.1f}{result["p95"]:>10.1f}')
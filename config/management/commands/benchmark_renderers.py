@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from config.benchmark import run_render
+from config.renderers import MessagePackRenderer, ORJSONRenderer
+from sales.models import Sale
+from sales.paginators import SaleCursorPagination
+from sales.serializers import SaleListSerializer
+
+
+class Command(BaseCommand):
+    help = ('Сравнение рендереров API на данных списка объектов Sale: стандартный JSONRenderer, ORJSONRenderer и '
+            'MessagePackRenderer. Сериализация выполняется один раз, замеряется только кодирование ответа.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='Количество объектов Sale в ответе.')
+        parser.add_argument('--repeats', type=int, default=50)
+
+    def handle(self, *args, **options):
+        sales = (Sale.objects.select_related(*SaleListSerializer.related_fields)
+                 .order_by(*SaleCursorPagination.ordering)[:options['limit']])
+        data = SaleListSerializer(sales, many=True).data
+        renderers = [('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer()),
+                     ('MessagePackRenderer', MessagePackRenderer())]
+
+        self.stdout.write(f'{"рендерер":<22}{"повторов":>10}{"в секунду":>12}{"p50, мс":>10}{"p95, мс":>10}'
+                          f'{"байт":>12}')
+        for name, renderer in renderers:
+            result = run_render(renderer, data, options['repeats'])
+            self.stdout.write(f'{name:<22}{result["requests"]:>10}{result["rps"]:>12.1f}{result["p50"]:>10.2f}'
+                              f'{result["p95"]:>10.2f}{result["size"]:>12}')
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from config.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = ('Генерация схемы API (OpenAPI 2.0) в файлы OPENAPI_SCHEMA_ROOT, которые отдают представления swagger/ и '
+            'redoc/. Выполняется при сборке или развертывании после изменения API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Адрес API в схеме (например, https://api.example.com), по умолчанию '
+                                          'Swagger UI обращается к текущему хосту.')
+
+    def handle(self, *args, **options):
+        for path in generate_schema(options['url']):
+            self.stdout.write(f'Схема записана: {path}')
@@ -0,0 +1,146 @@
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+RANGE_CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def get_media_path(path):
+    """Функция возвращает нормализованный относительный путь файла и его полный путь внутри MEDIA_ROOT. Пути за
+    пределами MEDIA_ROOT возвращают 404."""
+
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        return path, Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404
+
+
+def patch_media_cache_control(response, path):
+    """Файлы из MEDIA_IMMUTABLE_PREFIXES названы по содержимому и не меняются, поэтому кэшируются на год с
+    директивой immutable; остальные — на MEDIA_CACHE_MAX_AGE секунд."""
+
+    if path.startswith(tuple(settings.MEDIA_IMMUTABLE_PREFIXES)):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def get_byte_range(request, size, etag, last_modified):
+    """Функция разбирает заголовок Range и возвращает пару (начало, конец) включительно, None, если нужно отдать файл
+    целиком (заголовка нет, он некорректен, например конец раньше начала, не поддерживается или устарел по If-Range),
+    и False, если диапазон начинается за пределами файла. Поддерживается один диапазон; запрос нескольких диапазонов
+    получает файл целиком, что допускает RFC 9110."""
+
+    header = request.META.get('HTTP_RANGE', '').strip()
+    match = RANGE_RE.match(header)
+    if match is None:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is not None and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first and last and int(last) < int(first):
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+def read_range(fullpath, start, end):
+    with fullpath.open('rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, path, fullpath):
+    """Выдача файла самим Django. Файл целиком возвращается FileResponse: WSGI-сервер с поддержкой
+    wsgi.file_wrapper (gunicorn, uWSGI) передает его системным вызовом sendfile. Поддерживаются условные запросы
+    (ETag, Last-Modified) и запрос одного диапазона байтов (Range, If-Range)."""
+
+    try:
+        stat = fullpath.stat()
+    except OSError:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = get_byte_range(request, stat.st_size, etag, last_modified)
+        if byte_range is None:
+            response = FileResponse(fullpath.open('rb'))
+        elif byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        else:
+            start, end = byte_range
+            content_type = mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream'
+            response = StreamingHttpResponse(read_range(fullpath, start, end), status=206,
+                                             content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return patch_media_cache_control(response, path)
+
+
+def redirect_to_server(path, fullpath):
+    """Передача выдачи файла веб-серверу: nginx получает внутренний адрес MEDIA_ACCEL_REDIRECT_PREFIX в заголовке
+    X-Accel-Redirect, Apache (mod_xsendfile) и lighttpd — полный путь в заголовке X-Sendfile. Диапазоны и условные
+    запросы обрабатывает веб-сервер, файл не читается процессом Django."""
+
+    response = HttpResponse(content_type=mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream')
+    if settings.MEDIA_DELIVERY == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(f'{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/")}/{path}')
+    else:
+        response['X-Sendfile'] = str(fullpath)
+    return patch_media_cache_control(response, path)
+
+
+@require_safe
+def serve_media(request, path):
+    """Выдача файлов MEDIA_ROOT способом из настройки MEDIA_DELIVERY: django, x-accel-redirect или x-sendfile."""
+
+    path, fullpath = get_media_path(path)
+    if settings.MEDIA_DELIVERY in ('x-accel-redirect', 'x-sendfile'):
+        return redirect_to_server(path, fullpath)
+    return serve_file(request, path, fullpath)
+
+
+def media_urlpatterns():
+    """Маршрут выдачи файлов MEDIA_ROOT по адресу MEDIA_URL. Если MEDIA_URL указывает на другой хост (например,
+    CDN) или выдача отключена (пустая настройка MEDIA_DELIVERY), маршрут не нужен."""
+
+    if not settings.MEDIA_DELIVERY or not settings.MEDIA_URL or urlsplit(settings.MEDIA_URL).netloc:
+        return []
+    prefix = re.escape(settings.MEDIA_URL.lstrip('/'))
+    return [re_path(rf'^{prefix}(?P<path>.*)$', serve_media, name='media')]
@@ -0,0 +1,40 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+
+from config.db_routers import apin_to_primary, choose_read_database, get_writer_key, pin_to_primary, read_database
+
+
+class ReplicaMiddleware:
+    """Выбор базы данных чтения для запроса (см. ReplicaRouter). Безопасные запросы читают из реплики, запросы на
+    запись и чтения автора в течение READ_YOUR_WRITES_TIMEOUT секунд после его записи — из основной базы данных.
+    Работает под WSGI и ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = get_writer_key(request)
+        token = read_database.set(choose_read_database(request, key is not None and cache.get(key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        pin_to_primary(request, key)
+        return response
+
+    async def __acall__(self, request):
+        key = get_writer_key(request)
+        token = read_database.set(choose_read_database(request, key is not None and await cache.aget(key)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        await apin_to_primary(request, key)
+        return response
@@ -0,0 +1,157 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """Пагинация по ключу (keyset). Курсор хранит значения всех полей сортировки последнего объекта страницы, поэтому
+    следующая страница выбирается условием вида (created, id) < (x, y) по индексу, а не смещением. Стоимость запроса
+    не зависит от номера страницы. Поля сортировки дополняются полями <ordering> пагинатора, чтобы порядок был
+    однозначным; последним полем должен быть уникальный ключ."""
+
+    ordering = ('-created', '-id')
+    page_size_query_param = 'page_size'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        names = {field.lstrip('-') for field in ordering}
+        return ordering + tuple(field for field in self.ordering if field.lstrip('-') not in names)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset: страница читается асинхронным запросом ORM."""
+
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Метод возвращает выборку страницы (на один объект больше размера страницы) без обращения к базе данных."""
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = self.cursor if self.cursor is not None else (False, None)
+
+        if reverse:
+            queryset = queryset.order_by(*(self._reverse_field(field) for field in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(self.coerce_position(queryset, position), reverse))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Метод формирует страницу из прочитанных объектов и определяет наличие соседних страниц."""
+
+        reverse, position = self.cursor if self.cursor is not None else (False, None)
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def coerce_position(self, queryset, position):
+        """Метод приводит значения позиции курсора к типам полей сортировки (полей модели или аннотаций выборки).
+        Подделанный курсор со значениями, которые не приводятся к типу поля, или с None возвращает 404, как
+        некорректный курсор CursorPagination."""
+
+        values = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            try:
+                if name == 'pk':
+                    model_field = queryset.model._meta.pk
+                else:
+                    model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                annotation = queryset.query.annotations.get(name)
+                model_field = annotation.output_field if annotation is not None else None
+            try:
+                if value is None or isinstance(value, (dict, list)):
+                    raise ValueError(value)
+                values.append(model_field.to_python(value) if model_field is not None else value)
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    @staticmethod
+    def _reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _get_keyset_filter(self, position, reverse):
+        """Метод строит условие лексикографического сравнения значений полей сортировки с позицией курсора."""
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.cursor[1]
+        return self.encode_cursor((False, position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.cursor[1]
+        return self.encode_cursor((True, position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            reverse, position = bool(cursor['r']), cursor['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, cursor):
+        reverse, position = cursor
+        encoded = urlsafe_b64encode(json.dumps({'r': int(reverse), 'p': position}).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            position.append(value)
+        return position
@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def encode_default(obj):
+    """Функция приводит значения, которые не поддерживаются кодировщиком, к типам JSON так же, как JSONEncoder DRF.
+    Decimal возвращается строкой без потери точности, если включена настройка COERCE_DECIMAL_TO_STRING."""
+
+    if isinstance(obj, Decimal):
+        return str(obj) if api_settings.COERCE_DECIMAL_TO_STRING else float(obj)
+    return JSONEncoder().default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson: словари, списки, даты и время кодируются в C без прохода json.JSONEncoder, остальные
+    типы — функцией encode_default. Ответ совпадает с JSONRenderer при настройках UNICODE_JSON и COMPACT_JSON по
+    умолчанию. Если запрошен отступ (indent), в том числе в Browsable API, или данные не кодируются orjson (например,
+    целые числа больше 64 бит), используется JSONRenderer, поэтому форматированный ответ не отличается от
+    стандартного. В компактном ответе может отличаться только запись чисел с плавающей точкой (1e-7 вместо 1e-07),
+    значения при этом совпадают."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSON-парсер на orjson."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Рендерер MessagePack. Выбирается заголовком Accept: application/msgpack или параметром ?format=msgpack;
+    значения, которых нет в MessagePack, кодируются функцией encode_default."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Парсер тела запроса с заголовком Content-Type: application/msgpack."""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
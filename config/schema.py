@@ -0,0 +1,85 @@
+from functools import lru_cache
+from hashlib import md5
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.exceptions import NotFound
+
+API_INFO = openapi.Info(
+    title="API documentation",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@snippets.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+SCHEMA_FILES = {
+    OpenAPICodecJson: 'openapi.json',
+    OpenAPICodecYaml: 'openapi.yaml',
+}
+
+
+def generate_schema(url=None):
+    """Функция генерирует схему API и записывает ее в OPENAPI_SCHEMA_ROOT во всех форматах SCHEMA_FILES. Схема
+    строится без запроса: если адрес API <url> не указан, Swagger UI обращается к API на текущем хосте. Функция
+    возвращает пути записанных файлов."""
+
+    schema = OpenAPISchemaGenerator(API_INFO, url=url).get_schema(request=None, public=True)
+    root = settings.OPENAPI_SCHEMA_ROOT
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for codec_class, name in SCHEMA_FILES.items():
+        path = root / name
+        path.write_bytes(codec_class(validators=[]).encode(schema))
+        paths.append(path)
+    return paths
+
+
+@lru_cache(maxsize=len(SCHEMA_FILES))
+def _read_schema(path, mtime_ns):
+    content = path.read_bytes()
+    return content, quote_etag(md5(content).hexdigest())
+
+
+def load_schema(name):
+    """Функция возвращает содержимое сгенерированной схемы <name> и ее ETag или None, если схема не сгенерирована.
+    Файл читается один раз и перечитывается только после изменения."""
+
+    path = settings.OPENAPI_SCHEMA_ROOT / name
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_schema(path, mtime_ns)
+
+
+class PrecomputedSchemaView(get_schema_view(API_INFO, public=True, permission_classes=[permissions.AllowAny])):
+    """Схема API из файлов команды generate_schema с ETag: клиент с актуальной схемой получает ответ 304. Если схема
+    не сгенерирована, в режиме DEBUG она строится при каждом запросе, иначе возвращается 404. Страницы Swagger UI и
+    ReDoc не содержат схему и загружают ее отдельным запросом, поэтому строятся без обхода маршрутов."""
+
+    def get(self, request, version='', format=None):
+        name = SCHEMA_FILES.get(getattr(request.accepted_renderer, 'codec_class', None))
+        if name is None:
+            return super().get(request, version, format)
+        schema = load_schema(name)
+        if schema is None:
+            if settings.DEBUG:
+                return super().get(request, version, format)
+            raise NotFound('Схема API не сгенерирована, выполните python manage.py generate_schema.')
+        content, etag = schema
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            renderer = request.accepted_renderer
+            response = HttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
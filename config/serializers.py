@@ -0,0 +1,64 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+class SparseFieldsetMixin:
+    """Выбор полей ответа параметрами запроса <fields> (только перечисленные поля) и <omit> (все, кроме
+    перечисленных), например ?fields=id,title,debt. Действует только на корневой сериализатор при чтении; неизвестные
+    имена полей игнорируются. В <related_by_field> указываются связи select_related, нужные полю, чтобы представление
+    не присоединяло таблицы пропущенных полей."""
+
+    fields_param = 'fields'
+    omit_param = 'omit'
+    related_by_field = {}
+
+    @classmethod
+    def get_requested_fields(cls, request, names):
+        """Метод возвращает имена из <names>, выбранные параметрами запроса, в исходном порядке."""
+
+        if request is None or request.method not in SAFE_METHODS:
+            return list(names)
+        params = getattr(request, 'query_params', request.GET)
+        selected = list(names)
+        if params.get(cls.fields_param):
+            wanted = {name.strip() for name in params[cls.fields_param].split(',')}
+            selected = [name for name in selected if name in wanted]
+        if params.get(cls.omit_param):
+            omitted = {name.strip() for name in params[cls.omit_param].split(',')}
+            selected = [name for name in selected if name not in omitted]
+        return selected
+
+    @classmethod
+    def is_sparse(cls, request):
+        params = getattr(request, 'query_params', request.GET)
+        return request.method in SAFE_METHODS and bool(params.get(cls.fields_param) or params.get(cls.omit_param))
+
+    @classmethod
+    def get_select_related(cls, request):
+        """Метод возвращает связи select_related только для выбранных полей."""
+
+        return [lookup for name in cls.get_requested_fields(request, cls.Meta.fields)
+                for lookup in cls.related_by_field.get(name, ())]
+
+    @classmethod
+    def select_related_for(cls, queryset, request):
+        """Метод присоединяет к выборке <queryset> только связи выбранных полей. Пустой вызов select_related()
+        присоединил бы все обязательные связи, поэтому без нужных связей выборка возвращается без изменений."""
+
+        related = cls.get_select_related(request)
+        return queryset.select_related(*related) if related else queryset
+
+    @classmethod
+    def trim(cls, data, request):
+        """Метод оставляет в готовом представлении объекта только выбранные поля."""
+
+        return {name: data[name] for name in cls.get_requested_fields(request, data)}
+
+    def is_root(self):
+        return self.parent is None or (isinstance(self.parent, ListSerializer) and self.parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_root():
+            return fields
+        return {name: fields[name] for name in self.get_requested_fields(self.context.get('request'), fields)}
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'django_filters',
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'drf_yasg',
 
+    'config',
     'users',
     'sales',
     'contacts',
@@ -60,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +91,12 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Соединения с базой данных сохраняются между запросами DB_CONN_MAX_AGE секунд (0 — закрывать после каждого запроса)
+# и проверяются перед первым обращением в каждом запросе. DB_POOL_MODE=transaction — режим для пула соединений
+# уровня транзакций (PgBouncer pool_mode=transaction): серверные курсоры отключаются, так как между транзакциями
+# сессия может смениться.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'session')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -95,10 +104,24 @@ DATABASES = {
         'USER': os.getenv('USER'),
         'HOST': os.getenv('HOST'),
         'PASSWORD': os.getenv('PASSWORD'),
-        'PORT': 5432,
+        'PORT': int(os.getenv('DB_PORT', 5432)),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'transaction',
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS — хосты через запятую с теми же учетными данными, что и у основной базы
+# данных. Безопасные запросы читают из случайной реплики, а автор записи READ_YOUR_WRITES_TIMEOUT секунд после нее
+# читает из основной базы данных. В тестах реплики совпадают с основной базой данных.
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    replica_alias = f'replica_{index}'
+    DATABASES[replica_alias] = {**DATABASES['default'], 'HOST': replica_host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(replica_alias)
+DATABASE_ROUTERS = ['config.db_routers.ReplicaRouter']
+READ_YOUR_WRITES_TIMEOUT = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -141,6 +164,18 @@ STATICFILES_DIRS = (
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Выдача файлов MEDIA_ROOT (config.media): django — самим Django через FileResponse, x-accel-redirect — nginx по
+# внутреннему адресу MEDIA_ACCEL_REDIRECT_PREFIX, x-sendfile — Apache (mod_xsendfile) или lighttpd. Файлы, кроме
+# неизменяемых (MEDIA_IMMUTABLE_PREFIXES), кэшируются клиентами MEDIA_CACHE_MAX_AGE секунд. По умолчанию Django
+# отдает файлы только в режиме DEBUG; без DEBUG маршрут не создается, пока способ выдачи не указан явно.
+MEDIA_DELIVERY = os.getenv('MEDIA_DELIVERY', 'django' if DEBUG else '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = 60 * 60
+MEDIA_IMMUTABLE_PREFIXES = ('users/avatars/', 'users/thumbnails/')
+
+# Каталог схемы API, которую генерирует команда generate_schema.
+OPENAPI_SCHEMA_ROOT = BASE_DIR / 'schema'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -207,8 +242,19 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.ORJSONRenderer',
+        'config.renderers.MessagePackRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.renderers.ORJSONParser',
+        'config.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SWAGGER_SETTINGS = {
@@ -230,9 +276,46 @@ EMAIL_USE_TLS = False
 EMAIL_USE_SSL = True
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+if os.getenv('LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Кэш пользователей для аутентификации по JWT: в общем кэше запись живет AUTH_USER_CACHE_TIMEOUT секунд, в памяти
+# процесса — AUTH_USER_LOCAL_CACHE_TIMEOUT секунд (не больше AUTH_USER_LOCAL_CACHE_SIZE записей).
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_USER_LOCAL_CACHE_TIMEOUT = 5
+AUTH_USER_LOCAL_CACHE_SIZE = 10000
+
+# Страницы справочника пользователей хранятся в общем кэше USER_DIRECTORY_CACHE_TIMEOUT секунд.
+USER_DIRECTORY_CACHE_TIMEOUT = 30
+
+# Размер стороны квадратных миниатюр аватарок в пикселях.
+AVATAR_THUMBNAIL_SIZE = 128
+
 CELERY_BROKER_URL = os.getenv('LOCATION')
 CELERY_RESULT_BACKEND = os.getenv('LOCATION')
 CELERY_TIMEZONE = 'Australia/Tasmania'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
-CELERY_TASK_ALWAYS_EAGER = True
+# Без брокера (LOCATION) задачи выполняются синхронно в процессе, который их ставит; с брокером — в воркере Celery.
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', '0' if CELERY_BROKER_URL else '1') in ('1', 'true')
+CELERY_BEAT_SCHEDULE = {
+    'take-debt-snapshots': {
+        'task': 'sales.tasks.take_debt_snapshots',
+        'schedule': 60 * 60,
+    },
+    'propagate-debt-rollups': {
+        'task': 'sales.tasks.propagate_debt_rollups',
+        'schedule': 60,
+    },
+}
@@ -0,0 +1,128 @@
+import json
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, router
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.middleware import ReplicaMiddleware
+from users.models import User
+from users.tests import UserModelTestCase
+
+
+class SchemaViewTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.schema_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(OPENAPI_SCHEMA_ROOT=Path(self.schema_root.name))
+        self.settings_override.enable()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        self.schema_root.cleanup()
+        return super().tearDown()
+
+    def test_generated_schema_is_served_with_etag(self):
+        """Схема, сгенерированная командой generate_schema, отдается из файла с ETag, повторный запрос получает
+        304."""
+
+        call_command('generate_schema', stdout=StringIO())
+        content = (Path(self.schema_root.name) / 'openapi.json').read_bytes()
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, content)
+        self.assertIn('/sales/', json.loads(content)['paths'])
+
+        response = self.client.get('/swagger/', {'format': 'openapi'}, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get('/redoc/', {'format': 'yaml'})
+        self.assertEqual(response.content, (Path(self.schema_root.name) / 'openapi.yaml').read_bytes())
+
+    def test_schema_is_generated_live_only_in_debug(self):
+        """Без сгенерированной схемы она строится при запросе только в режиме DEBUG."""
+
+        response = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        with self.settings(DEBUG=True):
+            response = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/sales/', response.json()['paths'])
+
+    def test_ui_page_does_not_need_schema(self):
+        """Страница Swagger UI открывается без сгенерированной схемы и загружает ее отдельным запросом."""
+
+        response = self.client.get('/swagger/', headers={'Accept': 'text/html'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTestCase(UserModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(lambda request: router.db_for_read(User))
+
+    def read_database(self, method, headers):
+        return self.middleware(getattr(self.factory, method)('/products/', headers=headers))
+
+    def test_safe_requests_read_from_replica(self):
+        """Безопасные запросы читают из реплики, запросы на запись и код вне запроса — из основной базы данных."""
+
+        self.assertEqual(self.read_database('get', self.headers_user_1), 'replica')
+        self.assertEqual(self.read_database('post', self.headers_user_1), 'default')
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_write(User), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'sales'))
+
+    def test_author_reads_own_writes_from_primary(self):
+        """После записи автор читает из основной базы данных, пока не истечет READ_YOUR_WRITES_TIMEOUT."""
+
+        self.read_database('patch', self.headers_user_1)
+        self.assertEqual(self.read_database('get', self.headers_user_1), 'default')
+        self.assertEqual(self.read_database('get', self.headers_user_2), 'replica')
+
+        cache.clear()
+        self.assertEqual(self.read_database('get', self.headers_user_1), 'replica')
+
+
+@unittest.skipUnless(settings.DATABASE_REPLICAS, 'Требуется реплика в DB_REPLICA_HOSTS')
+class ReplicaReadTestCase(APITransactionTestCase):
+    """Проверка с настоящей репликой (DB_REPLICA_HOSTS): данные фиксируются, чтобы их видело соединение реплики."""
+
+    databases = '__all__'
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.replica = connections[settings.DATABASE_REPLICAS[0]]
+        self.user = User.objects.create(email='replica@test.com', is_active=True)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_reads_go_to_replica_and_author_reads_own_writes(self):
+        """Чтение идет в реплику, запись и чтение автора после нее — в основную базу данных."""
+
+        with self.settings(DATABASE_REPLICAS=[self.replica.alias]):
+            # В основную базу данных идет только загрузка пользователя в кэш аутентификации
+            with self.assertNumQueries(1), CaptureQueriesContext(self.replica) as queries:
+                response = self.client.get('/products/', headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(queries)
+
+            with CaptureQueriesContext(self.replica) as queries:
+                response = self.client.post('/products/', {'title': 'Lada', 'model': 'Granta', 'release': '2023-12-29',
+                                                           'product_user': self.user.email}, headers=self.headers)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                response = self.client.get('/products/', headers=self.headers)
+            self.assertEqual(len(response.json()), 1)
+            self.assertFalse(queries)
@@ -14,31 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
 
-from config import settings
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="API documentation",
-        default_version='v1',
-        description="Test description",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@snippets.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from config.media import media_urlpatterns
+from config.schema import PrecomputedSchemaView
 
 urlpatterns = [
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('swagger/', PrecomputedSchemaView.with_ui('swagger'), name='schema-swagger-ui'),
+    path('redoc/', PrecomputedSchemaView.with_ui('redoc'), name='schema-redoc'),
 
     path('admin/', admin.site.urls),
     path('auth/', include('djoser.urls')),
@@ -47,4 +31,4 @@ urlpatterns = [
     path('products/', include('products.urls', namespace='products')),
     path('sales/', include('sales.urls', namespace='sales')),
     path('user/', include('users.urls', namespace='user')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + media_urlpatterns()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContactsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contacts'
+
+    def ready(self):
+        import contacts.signals  # noqa: F401
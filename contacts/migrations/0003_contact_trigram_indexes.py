@@ -0,0 +1,36 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_COLUMNS = ('city', 'country')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Создает GIN-индексы pg_trgm по выражению, которое Django использует для поиска <icontains>. Индексы нужны
+    только в PostgreSQL, в остальных СУБД поиск выполняется без них."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS contacts_contact_{column}_trgm '
+            f'ON contacts_contact USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS contacts_contact_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0002_alter_contact_email'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
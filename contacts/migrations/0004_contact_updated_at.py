@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_contact_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='изменено'),
+            preserve_default=False,
+        ),
+    ]
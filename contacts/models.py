@@ -9,6 +9,7 @@ class Contact(models.Model):
     street = models.CharField(max_length=150, verbose_name='улица')
     number = models.PositiveIntegerField(verbose_name='номер дома')
     contact_user = models.ForeignKey('users.User', on_delete=models.CASCADE, verbose_name='создатель контактов')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='изменено')
 
     def __str__(self):
         return f'{self.email} ({self.country})'
@@ -15,11 +15,11 @@ class IsActiveAndIsOwner(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
-            return request.user == obj.contact_user
+            return request.user.pk == obj.contact_user_id
         elif request.method in ('PATCH', 'PUT', 'POST'):
-            return request.user == obj.contact_user
+            return request.user.pk == obj.contact_user_id
         elif request.method == 'DELETE':
             if not request.user.is_active:
                 return False
-            return request.user == obj.contact_user or request.user.is_superuser
+            return request.user.pk == obj.contact_user_id or request.user.is_superuser
         return False
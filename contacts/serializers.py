@@ -1,19 +1,24 @@
 from rest_framework import serializers
 
+from config.serializers import SparseFieldsetMixin
 from contacts.models import Contact
-from users.models import User
+from users.fields import UserEmailField
 
 
-class ContactSerializer(serializers.ModelSerializer):
-    contact_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+class ContactSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    related_by_field = {'contact_user': ('contact_user',)}
+
+    contact_user = UserEmailField()
 
     class Meta:
         model = Contact
         fields = ('id', 'email', 'country', 'city', 'street', 'number', 'contact_user')
 
 
-class ContactListSerializer(serializers.ModelSerializer):
-    contact_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+class ContactListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    related_by_field = {'contact_user': ('contact_user',)}
+
+    contact_user = UserEmailField()
 
     class Meta:
         model = Contact
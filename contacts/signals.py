@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from contacts.models import Contact
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def touch_user_contacts(sender, instance, created, update_fields=None, **kwargs):
+    """Список контактов содержит email создателя, а его ETag вычисляется по полю <updated_at> контактов, поэтому после
+    изменения пользователя это поле обновляется у его контактов. Сохранения без изменения email (например, времени
+    входа) контакты не затрагивают."""
+
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    Contact.objects.filter(contact_user_id=instance.pk).update(updated_at=timezone.now())
@@ -516,3 +516,16 @@ class ContactTestCase(ContactModelTestCase):
         self.assertTrue(
             Contact.objects.count() == 1
         )
+
+
+class ContactConditionalGetTestCase(ContactModelTestCase):
+    def test_owner_email_change_returns_new_etag(self):
+        """После изменения email создателя список возвращается полностью с новым ETag."""
+
+        etag = self.client.get('/contacts/', headers=self.headers_user_1).headers['ETag']
+        self.user_test.email = 'renamed@test.com'
+        self.user_test.save()
+
+        response = self.client.get('/contacts/', headers={**self.headers_user_1, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
@@ -1,10 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from contacts.apps import ContactsConfig
-from contacts.views import ContactViewSet
+from contacts.views import ContactViewSet, ContactListAsyncAPIView, ContactRetrieveAsyncAPIView
 
 app_name = ContactsConfig.name
 router = DefaultRouter()
 router.register('', ContactViewSet, basename='contacts')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('async/', ContactListAsyncAPIView.as_view(), name='contacts_list_async'),
+    path('async/<int:pk>/', ContactRetrieveAsyncAPIView.as_view(), name='contacts_detail_async'),
+] + router.urls
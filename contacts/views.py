@@ -1,12 +1,15 @@
-from rest_framework import viewsets
+from rest_framework import generics, viewsets
 
+from config.async_views import AsyncAPIView, AsyncListModelMixin, AsyncRetrieveModelMixin
+from config.conditional import ConditionalListMixin
 from contacts.models import Contact
 from contacts.permissions import IsActiveAndIsOwner
 from contacts.serializers import ContactSerializer, ContactListSerializer
+from users.authentication import CachedJWTAuthentication
 
 
 # Create your views here.
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """Для создания, удаления, изменения и получения объектов модели Contact."""
 
     permission_classes = (IsActiveAndIsOwner, )
@@ -27,3 +30,36 @@ class ContactViewSet(viewsets.ModelViewSet):
 
     def get_serializer_class(self):
         return self.serializers.get(self.action, self.default_serializer)
+
+    def get_queryset(self):
+        return self.get_serializer_class().select_related_for(super().get_queryset(), self.request)
+
+
+class ContactListAsyncAPIView(AsyncAPIView, ConditionalListMixin, generics.ListAPIView, AsyncListModelMixin):
+    """Асинхронный вывод списка объектов модели Contact для ASGI-сервера."""
+
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsActiveAndIsOwner,)
+    queryset = Contact.objects.all()
+    serializer_class = ContactListSerializer
+
+    def get_queryset(self):
+        return self.serializer_class.select_related_for(super().get_queryset(), self.request)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+class ContactRetrieveAsyncAPIView(AsyncAPIView, generics.RetrieveAPIView, AsyncRetrieveModelMixin):
+    """Асинхронный вывод объекта модели Contact для ASGI-сервера."""
+
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsActiveAndIsOwner,)
+    queryset = Contact.objects.all()
+    serializer_class = ContactSerializer
+
+    def get_queryset(self):
+        return self.serializer_class.select_related_for(super().get_queryset(), self.request)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
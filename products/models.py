@@ -7,6 +7,7 @@ class Product(models.Model):
     model = models.CharField(max_length=150, verbose_name='Модель')
     release = models.DateField(db_index=True, verbose_name='Дата выхода')
     product_user = models.ForeignKey('users.User', on_delete=models.CASCADE, verbose_name='Создатель продукта')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменено')
 
     def __str__(self):
         return f'Продукт {self.title}'
@@ -1,19 +1,24 @@
 from rest_framework import serializers
 
+from config.serializers import SparseFieldsetMixin
 from products.models import Product
-from users.models import User
+from users.fields import UserEmailField
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    product_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    related_by_field = {'product_user': ('product_user',)}
+
+    product_user = UserEmailField()
 
     class Meta:
         model = Product
         fields = ('id', 'title', 'model', 'release', 'product_user')
 
 
-class ProductListSerializer(serializers.ModelSerializer):
-    product_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    related_by_field = {'product_user': ('product_user',)}
+
+    product_user = UserEmailField()
 
     class Meta:
         model = Product
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Product
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def touch_user_products(sender, instance, created, update_fields=None, **kwargs):
+    """Список продуктов содержит email создателя, а его ETag вычисляется по полю <updated_at> продуктов, поэтому после
+    изменения пользователя это поле обновляется у его продуктов. Сохранения без изменения email (например, времени
+    входа) продукты не затрагивают."""
+
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    Product.objects.filter(product_user_id=instance.pk).update(updated_at=timezone.now())
@@ -508,3 +508,53 @@ class ProductTestCase(ProductModelTestCase):
         self.assertTrue(
             Product.objects.count() == 1
         )
+
+
+class ProductConditionalGetTestCase(ProductModelTestCase):
+    def test_unchanged_list_returns_not_modified(self):
+        """Повторный запрос списка с ETag без изменений возвращает ответ 304 одним агрегирующим запросом."""
+
+        response = self.client.get('/products/', headers=self.headers_user_1)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+
+        # Повторный запрос: только агрегат, пользователь берется из кэша аутентификации
+        with self.assertNumQueries(1):
+            response = self.client.get('/products/', headers={**self.headers_user_1, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changed_list_returns_new_etag(self):
+        """После изменения продукта список возвращается полностью с новым ETag."""
+
+        etag = self.client.get('/products/', headers=self.headers_user_1).headers['ETag']
+        self.product_2.title = 'Жигули'
+        self.product_2.save()
+
+        response = self.client.get('/products/', headers={**self.headers_user_1, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_owner_email_change_returns_new_etag(self):
+        """После изменения email создателя список возвращается полностью с новым ETag."""
+
+        etag = self.client.get('/products/', headers=self.headers_user_1).headers['ETag']
+        self.user_test.email = 'renamed@test.com'
+        self.user_test.save()
+
+        response = self.client.get('/products/', headers={**self.headers_user_1, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class ProductSparseFieldsetTestCase(ProductModelTestCase):
+    def test_user_can_select_product_fields(self):
+        """Параметры <fields> и <omit> сокращают ответ; без поля <product_user> пользователь не загружается."""
+
+        # Запросы: пользователь и продукт без присоединенного владельца
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/products/{self.product_1.pk}/?fields=id,title', headers=self.headers_user_1)
+        self.assertEqual(response.json(), {'id': self.product_1.pk, 'title': self.product_1.title})
+
+        response = self.client.get('/products/?omit=product_user', headers=self.headers_user_1)
+        for product in response.json():
+            self.assertEqual(set(product), {'title'})
@@ -1,10 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from products.apps import ProductsConfig
-from products.views import ProductViewSet
+from products.views import ProductViewSet, ProductListAsyncAPIView, ProductRetrieveAsyncAPIView
 
 app_name = ProductsConfig.name
 router = DefaultRouter()
 router.register('', ProductViewSet, basename='products')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('async/', ProductListAsyncAPIView.as_view(), name='products_list_async'),
+    path('async/<int:pk>/', ProductRetrieveAsyncAPIView.as_view(), name='products_detail_async'),
+] + router.urls
@@ -1,12 +1,15 @@
-from rest_framework import viewsets
+from rest_framework import generics, viewsets
 
+from config.async_views import AsyncAPIView, AsyncListModelMixin, AsyncRetrieveModelMixin
+from config.conditional import ConditionalListMixin
 from products.models import Product
 from products.permissions import IsActiveAndIsOwner
 from products.serializers import ProductSerializer, ProductListSerializer
+from users.authentication import CachedJWTAuthentication
 
 
 # Create your views here.
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """Для создания, удаления, изменения и получения объектов модели Product."""
 
     permission_classes = (IsActiveAndIsOwner,)
@@ -27,3 +30,36 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     def get_serializer_class(self):
         return self.serializers.get(self.action, self.default_serializer)
+
+    def get_queryset(self):
+        return self.get_serializer_class().select_related_for(super().get_queryset(), self.request)
+
+
+class ProductListAsyncAPIView(AsyncAPIView, ConditionalListMixin, generics.ListAPIView, AsyncListModelMixin):
+    """Асинхронный вывод списка объектов модели Product для ASGI-сервера."""
+
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsActiveAndIsOwner,)
+    queryset = Product.objects.all()
+    serializer_class = ProductListSerializer
+
+    def get_queryset(self):
+        return self.serializer_class.select_related_for(super().get_queryset(), self.request)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+
+class ProductRetrieveAsyncAPIView(AsyncAPIView, generics.RetrieveAPIView, AsyncRetrieveModelMixin):
+    """Асинхронный вывод объекта модели Product для ASGI-сервера."""
+
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsActiveAndIsOwner,)
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+
+    def get_queryset(self):
+        return self.serializer_class.select_related_for(super().get_queryset(), self.request)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
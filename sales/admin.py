@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
 
-from sales.models import Sale
+from sales.models import Sale, DebtWriteOff, DebtTransaction
+from sales.tasks import resumable_write_off_jobs, write_off_debt
 
 
 # Register your models here.
@@ -14,4 +16,56 @@ class SaleAdmin(admin.ModelAdmin):
 
     @admin.action(description='Погашение задолженностей')
     def admin_action(self, request, queryset):
-        queryset.update(debt=0.00)
+        """Создает фоновое задание на погашение задолженностей выбранных объектов. Ход выполнения отображается в
+        разделе <Погашения задолженностей>."""
+
+        sale_ids = list(queryset.exclude(debt=0).order_by('pk').values_list('pk', flat=True))
+        job = DebtWriteOff.objects.create(sale_ids=sale_ids, total=len(sale_ids), created_by=request.user)
+        transaction.on_commit(lambda: write_off_debt.delay(job.pk))
+        self.message_user(request, f'Создано задание на погашение задолженностей №{job.pk}: {job.total} звеньев.')
+
+
+@admin.register(DebtWriteOff)
+class DebtWriteOffAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'progress', 'total', 'created_by', 'created', 'updated')
+    list_display_links = ('id',)
+    list_filter = ('status',)
+    exclude = ('sale_ids',)
+    readonly_fields = ('status', 'total', 'processed', 'last_pk', 'created_by', 'created', 'updated', 'error')
+    actions = ['resume_action']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Прогресс')
+    def progress(self, obj):
+        if not obj.total:
+            return '100%'
+        return f'{obj.processed * 100 // obj.total}%'
+
+    @admin.action(description='Возобновить погашение')
+    def resume_action(self, request, queryset):
+        """Повторно ставит в очередь задания, завершенные с ошибкой или зависшие (см. resumable_write_off_jobs).
+        Обработка продолжается с первого необработанного звена. Выполняющиеся задания не перезапускаются, чтобы
+        звенья не обрабатывались дважды."""
+
+        job_ids = list(resumable_write_off_jobs().filter(pk__in=queryset.values('pk')).values_list('pk', flat=True))
+        for job_id in job_ids:
+            transaction.on_commit(lambda job_id=job_id: write_off_debt.delay(job_id))
+        self.message_user(request, f'Возобновлено заданий: {len(job_ids)}, пропущено выполняющихся или '
+                                   f'завершенных: {queryset.count() - len(job_ids)}.')
+
+
+@admin.register(DebtTransaction)
+class DebtTransactionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sale', 'kind', 'amount', 'created', 'created_by')
+    list_display_links = ('id',)
+    list_filter = ('kind',)
+    list_select_related = ('sale', 'created_by')
+    raw_id_fields = ('sale',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
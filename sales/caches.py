@@ -0,0 +1,52 @@
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from sales.models import Sale
+
+SALE_CACHE_TIMEOUT = 60 * 60
+SALE_CACHE_BATCH_SIZE = 500
+
+
+def sale_cache_key(pk):
+    """Ключ кэша детальной информации об объекте Sale."""
+
+    return f'sales:retrieve:{pk}'
+
+
+def invalidate_sales(rows, touch=True):
+    """Функция удаляет из кэша детальную информацию о звеньях <rows> — пар (id, путь) — и обо всех их потомках, так
+    как ответ звена содержит его поставщиков, и, если <touch>, обновляет у них поле <updated_at>, по которому
+    вычисляется ETag списка (задолженность в список не входит, поэтому ее изменения потомков не затрагивают). Ключи
+    удаляются сразу и повторно после фиксации транзакции, чтобы параллельный запрос не вернул в кэш данные,
+    прочитанные до фиксации."""
+
+    keys = set()
+    prefixes = []
+    for pk, path in rows:
+        keys.add(pk)
+        prefixes.append(f'{path}{pk}/')
+    roots = []
+    for prefix in sorted(prefixes):
+        if not roots or not prefix.startswith(roots[-1]):
+            roots.append(prefix)
+    for start in range(0, len(roots), SALE_CACHE_BATCH_SIZE):
+        condition = reduce(or_, (Q(path__startswith=prefix) for prefix in roots[start:start + SALE_CACHE_BATCH_SIZE]))
+        keys.update(Sale.objects.filter(condition).values_list('pk', flat=True))
+    if not keys:
+        return
+    if touch:
+        Sale.objects.filter(pk__in=keys).update(updated_at=timezone.now())
+    keys = [sale_cache_key(pk) for pk in keys]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_sales_where(condition):
+    """Функция удаляет из кэша детальную информацию о звеньях, выбранных условием <condition>, и об их потомках."""
+
+    invalidate_sales(Sale.objects.filter(condition).values_list('pk', 'path'))
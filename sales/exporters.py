@@ -0,0 +1,88 @@
+import csv
+import json
+
+from django.db import connections, transaction
+
+from sales.models import Sale
+
+# Первое поле — ключ для постраничного чтения без серверного курсора
+EXPORT_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'unit': 'unit',
+    'level': 'level',
+    'supplier_id': 'supplier_id',
+    'supplier_title': 'supplier__title',
+    'created': 'created',
+    'debt': 'debt',
+    'sale_user': 'sale_user__email',
+    'contact_email': 'contact__email',
+    'contact_country': 'contact__country',
+    'contact_city': 'contact__city',
+    'product_title': 'product__title',
+    'product_model': 'product__model',
+}
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Буфер для csv.writer, который не хранит строки, а сразу возвращает их."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Генератор строк выгрузки объектов Sale. Строки читаются одним запросом через серверный курсор пачками по
+    <chunk_size> внутри транзакции, поэтому выгрузка соответствует одному снимку базы данных, а память процесса не
+    зависит от размера таблицы. Если серверные курсоры отключены (пул соединений в режиме transaction), без курсора
+    драйвер прочитал бы всю выборку в память, поэтому строки читаются страницами по ключу (id > последнего) в
+    транзакции REPEATABLE READ, которая сохраняет единый снимок."""
+
+    queryset = Sale.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list(*EXPORT_FIELDS.values())
+    connection = connections[rows.db]
+    if not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        with transaction.atomic(using=rows.db):
+            yield from rows.iterator(chunk_size=chunk_size)
+        return
+
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=rows.db):
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        page = list(rows[:chunk_size])
+        while page:
+            yield from page
+            if len(page) < chunk_size:
+                break
+            page = list(rows.filter(pk__gt=page[-1][0])[:chunk_size])
+
+
+def _to_text(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value if value is None or isinstance(value, (int, str)) else str(value)
+
+
+def export_csv(rows):
+    """Генератор выгрузки в формате CSV с заголовком."""
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS.keys())
+    for row in rows:
+        yield writer.writerow([_to_text(value) for value in row])
+
+
+def export_ndjson(rows):
+    """Генератор выгрузки в формате NDJSON: один JSON-объект на строку."""
+
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, map(_to_text, row))), ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (export_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
@@ -0,0 +1,84 @@
+import django_filters
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Greatest
+from rest_framework.filters import SearchFilter, OrderingFilter
+
+from sales.models import Sale
+
+
+class SaleFilter(django_filters.FilterSet):
+    """Фильтры по иерархии сети. Параметр <under> возвращает всех потомков звена, параметр <ancestors_of> — всех его
+    поставщиков. Оба фильтра используют поле <path> и не обходят цепочку поставщиков по одному звену. Параметр <level>
+    фильтрует звенья по уровню иерархии."""
+
+    under = django_filters.NumberFilter(method='filter_under', label='Потомки звена')
+    ancestors_of = django_filters.NumberFilter(method='filter_ancestors_of', label='Поставщики звена')
+
+    class Meta:
+        model = Sale
+        fields = ('level', 'under', 'ancestors_of')
+
+    hierarchy_params = ('under', 'ancestors_of')
+
+    def _get_sale(self, value):
+        sales = getattr(self.request, 'hierarchy_sales', None)
+        if sales is not None:
+            return sales.get(value)
+        return Sale.objects.filter(pk=value).only('id', 'path').first()
+
+    @classmethod
+    async def aresolve(cls, request):
+        """Метод заранее загружает асинхронным запросом звенья из параметров <under> и <ancestors_of>, чтобы фильтры
+        не обращались к базе данных в асинхронном представлении."""
+
+        pks = set()
+        for name in cls.hierarchy_params:
+            try:
+                pks.add(int(request.query_params[name]))
+            except (KeyError, ValueError):
+                continue
+        request.hierarchy_sales = {sale.pk: sale async for sale in Sale.objects.filter(pk__in=pks).only('id', 'path')}
+
+    def filter_under(self, queryset, name, value):
+        sale = self._get_sale(value)
+        if sale is None:
+            return queryset.none()
+        return queryset.filter(path__startswith=sale.subtree_prefix)
+
+    def filter_ancestors_of(self, queryset, name, value):
+        sale = self._get_sale(value)
+        if sale is None:
+            return queryset.none()
+        return queryset.filter(pk__in=sale.ancestor_ids)
+
+
+class TrigramSearchFilter(SearchFilter):
+    """Поиск по полям <search_fields>. В PostgreSQL условие <icontains> обслуживают GIN-индексы pg_trgm, а результаты
+    сортируются по релевантности: наибольшему сходству слов запроса с полями поиска (pg_trgm word_similarity). Явная
+    сортировка через параметр <ordering> имеет приоритет над релевантностью. В остальных СУБД работает как обычный
+    SearchFilter."""
+
+    rank_field = 'search_rank'
+
+    def is_ranked(self, request, queryset):
+        return connections[queryset.db].vendor == 'postgresql' and bool(self.get_search_terms(request))
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        if not self.is_ranked(request, queryset):
+            return queryset
+        terms = ' '.join(self.get_search_terms(request))
+        similarities = [TrigramWordSimilarity(terms, field.lstrip('^=@$'))
+                        for field in self.get_search_fields(view, request)]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return queryset.annotate(**{self.rank_field: Cast(rank, FloatField())}).order_by(f'-{self.rank_field}')
+
+    def get_ordering(self, request, queryset, view):
+        """Метод возвращает сортировку для пагинации по ключу: по релевантности, если она не задана явно."""
+
+        ordering_filter = OrderingFilter()
+        if request.query_params.get(ordering_filter.ordering_param) or not self.is_ranked(request, queryset):
+            return ordering_filter.get_ordering(request, queryset, view)
+        return (f'-{self.rank_field}',)
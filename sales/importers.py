@@ -0,0 +1,275 @@
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from sales.models import Sale, DebtTransaction
+
+IMPORT_BATCH_SIZE = 5000
+ID_PATTERN = "'^[0-9]{1,18}$'"
+
+
+@dataclass
+class ImportResult:
+    loaded: int
+    imported: int
+    rejected: int
+
+
+class CsvImporter(ABC):
+    """Загрузка CSV-файла через COPY во временную таблицу PostgreSQL. Строки проверяются запросами над всей таблицей
+    сразу: каждое правило <rules> — пара (причина, условие), строки, подходящие под условие, отклоняются с этой
+    причиной. Принятые строки переносятся в рабочие таблицы пачками по <batch_size> строк, каждая пачка — в отдельной
+    транзакции. Отклоненные строки можно выгрузить в CSV с номером строки файла и причиной. При пуле соединений в
+    режиме transaction (DISABLE_SERVER_SIDE_CURSORS) временная таблица живет только внутри транзакции, поэтому вся
+    загрузка выполняется в одной транзакции, а пачки — в точках сохранения."""
+
+    staging = None
+    columns = ()
+    extra_columns = ()
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=IMPORT_BATCH_SIZE):
+        self.connection = connections[using]
+        self.using = using
+        self.batch_size = batch_size
+
+    def get_rules(self):
+        return []
+
+    def run(self, file, rejects=None):
+        if self.connection.vendor != 'postgresql':
+            raise NotImplementedError('Загрузка CSV поддерживается только для PostgreSQL.')
+        pooled = self.connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')
+        with transaction.atomic(using=self.using) if pooled else nullcontext(), self.connection.cursor() as cursor:
+            columns = ', '.join(f'{column} text' for column in self.columns)
+            extra = ''.join(f', {column}' for column in self.extra_columns)
+            cursor.execute(f'DROP TABLE IF EXISTS {self.staging}')
+            cursor.execute(f'CREATE TEMP TABLE {self.staging} (line bigserial PRIMARY KEY, {columns}{extra}, '
+                           f'reject text)')
+            cursor.copy_expert(f'COPY {self.staging} ({", ".join(self.columns)}) '
+                               f'FROM STDIN WITH (FORMAT csv, HEADER true)', file)
+            self.validate(cursor)
+            imported = self.merge(cursor)
+            cursor.execute(f'SELECT count(*), count(reject) FROM {self.staging}')
+            loaded, rejected = cursor.fetchone()
+            if rejects is not None:
+                cursor.copy_expert(f'COPY (SELECT line + 1 AS line, reject FROM {self.staging} '
+                                   f'WHERE reject IS NOT NULL ORDER BY line) TO STDOUT WITH (FORMAT csv, HEADER true)',
+                                   rejects)
+            cursor.execute(f'DROP TABLE {self.staging}')
+        return ImportResult(loaded=loaded, imported=imported, rejected=rejected)
+
+    def validate(self, cursor):
+        for rule in self.get_rules():
+            self.apply(cursor, rule)
+
+    def apply(self, cursor, rule):
+        """Метод выполняет шаг проверки: строку SQL как есть или правило (причина, условие)."""
+
+        if isinstance(rule, str):
+            cursor.execute(rule)
+            return cursor.rowcount
+        reason, condition = rule
+        cursor.execute(f'UPDATE {self.staging} s SET reject = %s WHERE s.reject IS NULL AND ({condition})',
+                       [reason])
+        return cursor.rowcount
+
+    def resolve_user(self, column):
+        return (f'UPDATE {self.staging} s SET user_id = u.id FROM users_user u '
+                f'WHERE s.reject IS NULL AND u.email = s.{column}')
+
+    def line_batches(self, cursor, condition='TRUE'):
+        """Генератор границ пачек (после, до) по номерам принятых строк, подходящих под условие."""
+
+        cursor.execute(f'SELECT min(line), max(line) FROM {self.staging} WHERE reject IS NULL AND ({condition})')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first - 1, last, self.batch_size):
+            yield start, start + self.batch_size
+
+    @abstractmethod
+    def merge(self, cursor):
+        """Метод переносит принятые строки временной таблицы в рабочие таблицы."""
+
+
+class ProductImporter(CsvImporter):
+    """Загрузка продуктов. Колонки: title, model, release (ГГГГ-ММ-ДД), product_user (email владельца)."""
+
+    staging = 'import_products'
+    columns = ('title', 'model', 'release', 'product_user')
+    extra_columns = ('user_id bigint',)
+
+    def get_rules(self):
+        return [
+            ('Не указано название', "coalesce(s.title, '') = '' OR length(s.title) > 150"),
+            ('Не указана модель', "coalesce(s.model, '') = '' OR length(s.model) > 150"),
+            ('Некорректная дата выхода',
+             "CASE WHEN s.release ~ '^[1-9][0-9]{3}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$' "
+             "THEN split_part(s.release, '-', 3)::int > extract(day from make_date("
+             "split_part(s.release, '-', 1)::int, split_part(s.release, '-', 2)::int, 1) "
+             "+ interval '1 month - 1 day') ELSE TRUE END"),
+            self.resolve_user('product_user'),
+            ('Пользователь не найден', 's.user_id IS NULL'),
+        ]
+
+    def merge(self, cursor):
+        imported = 0
+        for start, end in self.line_batches(cursor):
+            with transaction.atomic(using=self.using):
+                cursor.execute(f'INSERT INTO products_product (title, model, release, product_user_id, '
+                               f'updated_at) SELECT title, model, release::date, user_id, now() FROM {self.staging} '
+                               f'WHERE reject IS NULL AND line > %s AND line <= %s', [start, end])
+                imported += cursor.rowcount
+        return imported
+
+
+class ContactImporter(CsvImporter):
+    """Загрузка контактов. Колонки: email, country, city, street, number, contact_user (email владельца). Email
+    контакта уникален: строки с email, который уже есть в базе данных или встречается в файле раньше, отклоняются."""
+
+    staging = 'import_contacts'
+    columns = ('email', 'country', 'city', 'street', 'number', 'contact_user')
+    extra_columns = ('user_id bigint',)
+
+    def get_rules(self):
+        return [
+            ('Не указан email', "coalesce(s.email, '') = '' OR length(s.email) > 150"),
+            ('Не заполнен адрес', ' OR '.join(f"coalesce(s.{column}, '') = '' OR length(s.{column}) > 150"
+                                              for column in ('country', 'city', 'street'))),
+            ('Некорректный номер дома', "NOT coalesce(s.number ~ '^[0-9]{1,9}$', FALSE)"),
+            self.resolve_user('contact_user'),
+            ('Пользователь не найден', 's.user_id IS NULL'),
+            ('Контакт с таким email уже существует',
+             'EXISTS (SELECT 1 FROM contacts_contact c WHERE c.email = s.email)'),
+            ('Email повторяется в файле',
+             f'EXISTS (SELECT 1 FROM {self.staging} d WHERE d.email = s.email AND d.line < s.line '
+             f'AND d.reject IS NULL)'),
+        ]
+
+    def merge(self, cursor):
+        imported = 0
+        for start, end in self.line_batches(cursor):
+            with transaction.atomic(using=self.using):
+                cursor.execute(f'INSERT INTO contacts_contact (email, country, city, street, number, '
+                               f'contact_user_id, updated_at) SELECT email, country, city, street, number::int, '
+                               f'user_id, now() FROM {self.staging} '
+                               f'WHERE reject IS NULL AND line > %s AND line <= %s '
+                               f'ON CONFLICT (email) DO NOTHING', [start, end])
+                imported += cursor.rowcount
+        return imported
+
+
+class SaleImporter(CsvImporter):
+    """Загрузка звеньев сети. Колонки: ref (уникальный в файле ключ строки), title, unit, supplier (id существующего
+    звена) или supplier_ref (ref строки этого же файла), product (id продукта), contact (email контакта), sale_user
+    (email владельца), debt. Проверяются те же правила, что и в SupplierValidator, ProductValidator и
+    ContactValidator. Звенья переносятся по уровням иерархии, поэтому поставщики из файла создаются раньше своих
+    потомков; путь, уровень и суммы по поддеревьям поставщиков вычисляются при переносе, начальные задолженности
+    записываются в журнал DebtTransaction."""
+
+    staging = 'import_sales'
+    columns = ('ref', 'title', 'unit', 'supplier', 'supplier_ref', 'product', 'contact', 'sale_user', 'debt')
+    extra_columns = ('user_id bigint', 'product_id bigint', 'contact_id bigint', 'supplier_id bigint',
+                     'parent_line bigint', 'level int', 'new_id bigint', 'path text')
+
+    def get_rules(self):
+        units = ', '.join(f"'{value}'" for value in Sale.Kinds.values)
+        factory = f"'{Sale.Kinds.FACTORY.value}'"
+        return [
+            ('Не указан ref', "coalesce(s.ref, '') = ''"),
+            ('ref повторяется в файле',
+             f'EXISTS (SELECT 1 FROM {self.staging} d WHERE d.ref = s.ref AND d.line < s.line)'),
+            ('Не указано название', "coalesce(s.title, '') = '' OR length(s.title) > 150"),
+            ('Некорректное звено', f'coalesce(s.unit NOT IN ({units}), TRUE)'),
+            ('Некорректная задолженность', "NOT coalesce(s.debt ~ '^-?[0-9]{1,146}(\\.[0-9]{1,2})?$', FALSE)"),
+            self.resolve_user('sale_user'),
+            ('Пользователь не найден', 's.user_id IS NULL'),
+            f'UPDATE {self.staging} s SET product_id = p.id FROM products_product p WHERE s.reject IS NULL '
+            f'AND p.id = CASE WHEN s.product ~ {ID_PATTERN} THEN s.product::bigint END',
+            ('Продукт не найден', 's.product_id IS NULL'),
+            ('Нельзя добавлять продукты чужих пользователей',
+             'NOT EXISTS (SELECT 1 FROM products_product p WHERE p.id = s.product_id '
+             'AND p.product_user_id = s.user_id)'),
+            f'UPDATE {self.staging} s SET contact_id = c.id FROM contacts_contact c WHERE s.reject IS NULL '
+            f'AND c.email = s.contact',
+            ('Контакт не найден', 's.contact_id IS NULL'),
+            ('Нельзя добавлять контакты чужих пользователей',
+             'NOT EXISTS (SELECT 1 FROM contacts_contact c WHERE c.id = s.contact_id '
+             'AND c.contact_user_id = s.user_id)'),
+            ('Укажите либо supplier, либо supplier_ref', "s.supplier <> '' AND s.supplier_ref <> ''"),
+            f'UPDATE {self.staging} s SET supplier_id = x.id FROM sales_sale x WHERE s.reject IS NULL '
+            f'AND x.id = CASE WHEN s.supplier ~ {ID_PATTERN} THEN s.supplier::bigint END',
+            ('Поставщик не найден', "s.supplier <> '' AND s.supplier_id IS NULL"),
+            f'UPDATE {self.staging} s SET parent_line = p.line FROM {self.staging} p WHERE s.reject IS NULL '
+            f'AND p.ref = s.supplier_ref AND p.line <> s.line',
+            ('Поставщик из файла не найден', "s.supplier_ref <> '' AND s.parent_line IS NULL"),
+            ('Звено "Завод" не может ссылаться на другие звенья.',
+             f's.unit = {factory} AND (s.supplier_id IS NOT NULL OR s.parent_line IS NOT NULL)'),
+            ('Выберете поставщика.', f's.unit <> {factory} AND s.supplier_id IS NULL AND s.parent_line IS NULL'),
+            ('Звено не может ссылаться на такой же тип звена.',
+             f'EXISTS (SELECT 1 FROM sales_sale x WHERE x.id = s.supplier_id AND x.unit = s.unit) '
+             f'OR EXISTS (SELECT 1 FROM {self.staging} p WHERE p.line = s.parent_line AND p.unit = s.unit)'),
+        ]
+
+    def validate(self, cursor):
+        """Метод дополнительно вычисляет уровни строк: сначала для звеньев без поставщика и с существующим
+        поставщиком, затем по цепочкам поставщиков из файла. Строки, уровень которых вычислить нельзя (поставщик из
+        файла отклонен или образует цикл), и строки глубже третьего уровня отклоняются."""
+
+        super().validate(cursor)
+        self.apply(cursor, f"UPDATE {self.staging} s SET level = 0, path = '/' "
+                           f"WHERE s.reject IS NULL AND s.supplier_id IS NULL AND s.parent_line IS NULL")
+        self.apply(cursor, f"UPDATE {self.staging} s SET level = x.level + 1, path = x.path || x.id || '/' "
+                           f"FROM sales_sale x WHERE s.reject IS NULL AND x.id = s.supplier_id")
+        while self.apply(cursor, f'UPDATE {self.staging} s SET level = p.level + 1 FROM {self.staging} p '
+                                 f'WHERE s.reject IS NULL AND s.level IS NULL AND p.line = s.parent_line '
+                                 f'AND p.reject IS NULL AND p.level IS NOT NULL'):
+            pass
+        self.apply(cursor, ('Поставщик из файла отклонен или образует цикл', 's.level IS NULL'))
+        self.apply(cursor, ('Уровень вложенности не должен превышать 3.', 's.level > 2'))
+        self.apply(cursor, ('Поставщик из файла отклонен',
+                            f'EXISTS (SELECT 1 FROM {self.staging} p WHERE p.line = s.parent_line '
+                            f'AND p.reject IS NOT NULL)'))
+        self.apply(cursor, f"UPDATE {self.staging} s SET new_id = nextval(pg_get_serial_sequence('sales_sale', 'id')) "
+                           f"WHERE s.reject IS NULL")
+
+    def merge(self, cursor):
+        imported = 0
+        for level in range(3):
+            self.apply(cursor, f"UPDATE {self.staging} s SET supplier_id = p.new_id, "
+                               f"path = p.path || p.new_id || '/' FROM {self.staging} p "
+                               f"WHERE s.reject IS NULL AND s.level = {level} AND p.line = s.parent_line")
+            for start, end in self.line_batches(cursor, f'level = {level}'):
+                batch = f'reject IS NULL AND level = {level} AND line > {start} AND line <= {end}'
+                with transaction.atomic(using=self.using):
+                    cursor.execute(
+                        f'INSERT INTO sales_sale (id, unit, title, supplier_id, path, level, created, updated_at, '
+                        f'sale_user_id, product_id, contact_id, debt, subtree_debt, subtree_count) '
+                        f'SELECT new_id, unit, title, supplier_id, path, level, now(), now(), user_id, product_id, '
+                        f'contact_id, debt::numeric, debt::numeric, 1 FROM {self.staging} WHERE {batch}')
+                    imported += cursor.rowcount
+                    cursor.execute(
+                        f'SELECT id FROM sales_sale WHERE id IN (SELECT ancestor::bigint FROM {self.staging} s, '
+                        f"unnest(string_to_array(trim(both '/' from s.path), '/')) AS ancestor WHERE {batch}) "
+                        f'ORDER BY id FOR UPDATE')
+                    cursor.execute(
+                        f'UPDATE sales_sale a SET subtree_debt = a.subtree_debt + x.debt, '
+                        f'subtree_count = a.subtree_count + x.nodes FROM ('
+                        f'SELECT ancestor::bigint AS id, sum(s.debt::numeric) AS debt, count(*) AS nodes '
+                        f"FROM {self.staging} s, unnest(string_to_array(trim(both '/' from s.path), '/')) AS ancestor "
+                        f'WHERE {batch} GROUP BY ancestor) x WHERE a.id = x.id')
+                    cursor.execute(
+                        f'INSERT INTO sales_debttransaction (sale_id, kind, amount, created) '
+                        f"SELECT new_id, CASE WHEN debt::numeric > 0 THEN '{DebtTransaction.Kinds.CHARGE.value}' "
+                        f"ELSE '{DebtTransaction.Kinds.PAYMENT.value}' END, debt::numeric, now() "
+                        f'FROM {self.staging} WHERE {batch} AND debt::numeric <> 0')
+        return imported
+
+
+IMPORTERS = {
+    'products': ProductImporter,
+    'contacts': ContactImporter,
+    'sales': SaleImporter,
+}
@@ -0,0 +1,30 @@
+from sales.models import Sale
+
+
+def load_suppliers(sales, related=()):
+    """Загружает цепочки поставщиков для объектов <sales> по уровням иерархии: один запрос на уровень (не больше трех
+    по правилу вложенности). Загруженные поставщики кладутся в кеш поля <supplier>, поэтому вложенные сериализаторы
+    получают их из памяти. В <related> передаются связи, которые нужно загрузить вместе с поставщиками."""
+
+    descriptor = Sale.supplier
+    pending = [sale for sale in sales if sale.supplier_id is not None and not descriptor.is_cached(sale)]
+    while pending:
+        suppliers = Sale.objects.select_related(*related).in_bulk({sale.supplier_id for sale in pending})
+        for sale in pending:
+            descriptor.field.set_cached_value(sale, suppliers.get(sale.supplier_id))
+        pending = [supplier for supplier in suppliers.values()
+                   if supplier.supplier_id is not None and not descriptor.is_cached(supplier)]
+
+
+async def aload_suppliers(sales, related=()):
+    """Асинхронный вариант load_suppliers для асинхронных представлений."""
+
+    descriptor = Sale.supplier
+    pending = [sale for sale in sales if sale.supplier_id is not None and not descriptor.is_cached(sale)]
+    while pending:
+        suppliers = {supplier.pk: supplier async for supplier in Sale.objects.select_related(*related).filter(
+            pk__in={sale.supplier_id for sale in pending})}
+        for sale in pending:
+            descriptor.field.set_cached_value(sale, suppliers.get(sale.supplier_id))
+        pending = [supplier for supplier in suppliers.values()
+                   if supplier.supplier_id is not None and not descriptor.is_cached(supplier)]
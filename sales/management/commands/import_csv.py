@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from sales.importers import IMPORT_BATCH_SIZE, IMPORTERS
+
+
+class Command(BaseCommand):
+    help = 'Загрузка продуктов, контактов или звеньев сети из CSV-файла через COPY (только PostgreSQL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORTERS, help='Что загружается: products, contacts или sales.')
+        parser.add_argument('path', help='Путь к CSV-файлу с заголовком.')
+        parser.add_argument('--rejects', help='Путь к CSV-файлу для отклоненных строк (номер строки и причина).')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Количество строк, переносимых в одной транзакции.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](using=options['database'], batch_size=options['batch_size'])
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                if options['rejects']:
+                    with open(options['rejects'], 'w', encoding='utf-8') as rejects:
+                        result = importer.run(file, rejects)
+                else:
+                    result = importer.run(file)
+        except (OSError, NotImplementedError) as exc:
+            raise CommandError(exc)
+        self.stdout.write(f'Прочитано строк: {result.loaded}, загружено: {result.imported}, '
+                          f'отклонено: {result.rejected}.')
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    """Заполняет поле <path> существующих звеньев, спускаясь по иерархии от заводов."""
+
+    Sale = apps.get_model('sales', 'Sale')
+    prefixes = {pk: f'/{pk}/' for pk in Sale.objects.filter(supplier__isnull=True).values_list('pk', flat=True)}
+    while prefixes:
+        children = list(Sale.objects.filter(supplier_id__in=prefixes).only('id', 'supplier_id', 'path'))
+        for child in children:
+            child.path = prefixes[child.supplier_id]
+        Sale.objects.bulk_update(children, ['path'], batch_size=1000)
+        prefixes = {child.pk: f'{child.path}{child.pk}/' for child in children}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='path',
+            field=models.CharField(db_index=True, default='/', editable=False, max_length=255,
+                                   verbose_name='Путь в иерархии'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
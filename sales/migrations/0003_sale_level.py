@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def fill_levels(apps, schema_editor):
+    """Заполняет поле <level> существующих звеньев, спускаясь по иерархии от заводов. Уровней не больше, чем звеньев;
+    если цепочки поставщиков образуют цикл, уровни не перестают изменяться и миграция прерывается со списком звеньев,
+    которые не удалось связать с заводом (путь которых миграция 0002 не заполнила)."""
+
+    Sale = apps.get_model('sales', 'Sale')
+    total = Sale.objects.count()
+    level = 0
+    while Sale.objects.filter(supplier__isnull=False, supplier__level=level).update(level=level + 1):
+        level += 1
+        if level > total:
+            unresolved = Sale.objects.filter(supplier__isnull=False, path='/').order_by('pk')
+            raise RuntimeError(
+                'Цепочки поставщиков образуют цикл, уровни не вычислены. Исправьте поставщиков звеньев: '
+                + ', '.join(f'{pk} (поставщик {supplier_id})'
+                            for pk, supplier_id in unresolved.values_list('pk', 'supplier_id'))
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_sale_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='level',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False, verbose_name='Уровень'),
+        ),
+        migrations.RunPython(fill_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def fill_rollups(apps, schema_editor):
+    """Заполняет суммы по поддеревьям существующих звеньев, поднимаясь по иерархии от самого глубокого уровня."""
+
+    Sale = apps.get_model('sales', 'Sale')
+    Sale.objects.update(subtree_debt=F('debt'), subtree_count=1)
+    max_level = Sale.objects.order_by('-level').values_list('level', flat=True).first() or 0
+    for level in range(max_level, 0, -1):
+        totals = Sale.objects.filter(level=level).values('supplier_id').annotate(
+            debt=Sum('subtree_debt'), nodes=Sum('subtree_count'))
+        suppliers = Sale.objects.in_bulk([total['supplier_id'] for total in totals])
+        for total in totals:
+            supplier = suppliers[total['supplier_id']]
+            supplier.subtree_debt += total['debt']
+            supplier.subtree_count += total['nodes']
+        Sale.objects.bulk_update(suppliers.values(), ['subtree_debt', 'subtree_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_sale_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='subtree_count',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Количество звеньев сети'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='subtree_debt',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=150,
+                                      verbose_name='Задолженность сети звена'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
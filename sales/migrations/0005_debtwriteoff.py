@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sales', '0004_sale_subtree_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DebtWriteOff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершено'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('sale_ids', models.JSONField(verbose_name='Звенья')),
+                ('total', models.PositiveIntegerField(verbose_name='Всего звеньев')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано звеньев')),
+                ('last_pk', models.BigIntegerField(default=0, verbose_name='Последнее обработанное звено')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Инициатор')),
+            ],
+            options={
+                'verbose_name': 'Погашение задолженностей',
+                'verbose_name_plural': 'Погашения задолженностей',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_debtwriteoff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'),
+            preserve_default=False,
+        ),
+    ]
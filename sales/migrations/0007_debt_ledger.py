@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def open_balances(apps, schema_editor):
+    """Записывает текущие задолженности звеньев в журнал начальными операциями, чтобы сумма журнала звена совпадала
+    с его задолженностью. Вид операции определяется знаком, как в DebtTransaction.kind_of."""
+
+    Sale = apps.get_model('sales', 'Sale')
+    DebtTransaction = apps.get_model('sales', 'DebtTransaction')
+    rows = Sale.objects.exclude(debt=0).values_list('pk', 'debt', 'created').iterator(chunk_size=2000)
+    batch = []
+    for pk, debt, created in rows:
+        kind = 'charge' if debt > 0 else 'payment'
+        batch.append(DebtTransaction(sale_id=pk, kind=kind, amount=debt, created=created))
+        if len(batch) == 2000:
+            DebtTransaction.objects.bulk_create(batch)
+            batch = []
+    DebtTransaction.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sales', '0006_sale_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DebtTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('charge', 'Начисление'), ('payment', 'Оплата'), ('write_off', 'Списание')], max_length=10, verbose_name='Вид операции')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=150, verbose_name='Сумма')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создано')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='debt_transactions', to='sales.sale', verbose_name='Звено')),
+            ],
+            options={
+                'verbose_name': 'Операция по задолженности',
+                'verbose_name_plural': 'Операции по задолженности',
+                'indexes': [models.Index(fields=['sale', 'created'], name='sales_debt_tx_sale_created')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DebtSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=150, verbose_name='Задолженность')),
+                ('taken_at', models.DateTimeField(verbose_name='Момент снимка')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='debt_snapshots', to='sales.sale', verbose_name='Звено')),
+            ],
+            options={
+                'verbose_name': 'Снимок задолженности',
+                'verbose_name_plural': 'Снимки задолженности',
+                'indexes': [models.Index(fields=['sale', 'taken_at'], name='sales_debt_snap_sale_taken')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
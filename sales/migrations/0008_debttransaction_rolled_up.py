@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_debt_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='debttransaction',
+            name='rolled_up',
+            field=models.BooleanField(default=True, verbose_name='Учтена в суммах по поддеревьям'),
+        ),
+        migrations.AddIndex(
+            model_name='debttransaction',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='sales_debt_tx_pending_rollup'),
+        ),
+    ]
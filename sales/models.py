@@ -1,7 +1,52 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 
 from users.models import NULLABLE
 
+ROLLUP_FIELDS = ('subtree_debt', 'subtree_count')
+ROLLUP_BATCH_SIZE = 500
+
+
+class SaleQuerySet(models.QuerySet):
+    def with_ownership(self):
+        """Метод добавляет к объектам признак <owners_match>: продукт и контакт звена принадлежат владельцу звена.
+        Признак вычисляется в том же запросе сравнением идентификаторов, без загрузки продукта, контакта и
+        пользователей."""
+
+        return self.annotate(owners_match=ExpressionWrapper(
+            Q(product__product_user_id=F('sale_user_id')) & Q(contact__contact_user_id=F('sale_user_id')),
+            output_field=BooleanField(),
+        ))
+
+    def write_off_debt(self):
+        """Метод обнуляет задолженность выбранных объектов, записывает в журнал операции списания и вычитает
+        задолженность из сумм по поддеревьям всех их поставщиков. Объекты и их поставщики блокируются методом
+        Sale.lock_with_suppliers в порядке id. Детальная информация об объектах и их потомках удаляется из кэша.
+        Возвращает количество измененных объектов."""
+        from sales.caches import invalidate_sales
+
+        with transaction.atomic(using=self.db):
+            locked = Sale.lock_with_suppliers(list(self.exclude(debt=0).values_list('pk', flat=True)))
+            rows = list(Sale.objects.filter(pk__in=locked).exclude(debt=0).order_by('pk').values_list(
+                'pk', 'path', 'debt'))
+            deltas = defaultdict(lambda: (Decimal(0), 0))
+            for pk, path, debt in rows:
+                for ancestor in (*Sale.ids_of(path), pk):
+                    deltas[ancestor] = (deltas[ancestor][0] - debt, 0)
+            Sale.apply_rollup(deltas)
+            DebtTransaction.objects.bulk_create([
+                DebtTransaction(sale_id=pk, kind=DebtTransaction.Kinds.WRITE_OFF, amount=-debt) for pk, _, debt in rows
+            ], batch_size=ROLLUP_BATCH_SIZE)
+            invalidate_sales([(pk, path) for pk, path, _ in rows], touch=False)
+            return Sale.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(debt=0, updated_at=timezone.now())
+
 
 # Create your models here.
 class Sale(models.Model):
@@ -12,15 +57,306 @@ class Sale(models.Model):
     unit = models.CharField(max_length=30, choices=Kinds.choices, default=Kinds.FACTORY, verbose_name='Звено')
     title = models.CharField(max_length=150, verbose_name='Название')
     supplier = models.ForeignKey('self', on_delete=models.SET_NULL, verbose_name='Поставщик', **NULLABLE)
+    path = models.CharField(max_length=255, default='/', db_index=True, editable=False,
+                            verbose_name='Путь в иерархии')
+    level = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False, verbose_name='Уровень')
     created = models.DateTimeField(db_index=True, auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменено')
     sale_user = models.ForeignKey('users.User', on_delete=models.CASCADE, verbose_name='Создатель сети')
     product = models.ForeignKey('products.Product', on_delete=models.DO_NOTHING, verbose_name='Продукты')
     contact = models.ForeignKey('contacts.Contact', on_delete=models.DO_NOTHING, verbose_name='Контакты')
     debt = models.DecimalField(max_digits=150, decimal_places=2, verbose_name='Задолженность')
+    subtree_debt = models.DecimalField(max_digits=150, decimal_places=2, default=0, editable=False,
+                                       verbose_name='Задолженность сети звена')
+    subtree_count = models.PositiveIntegerField(default=1, editable=False, verbose_name='Количество звеньев сети')
+
+    objects = SaleQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.title} ({self.unit})'
 
+    @property
+    def subtree_prefix(self):
+        """Префикс поля <path> всех потомков звена."""
+
+        return f'{self.path}{self.pk}/'
+
+    @property
+    def ancestor_ids(self):
+        """Идентификаторы всех поставщиков звена от завода до непосредственного поставщика."""
+
+        return self.ids_of(self.path)
+
+    @staticmethod
+    def ids_of(path):
+        """Метод возвращает идентификаторы звеньев, из которых состоит путь <path>."""
+
+        return [int(pk) for pk in path.strip('/').split('/') if pk]
+
+    def build_path(self):
+        """Метод возвращает путь звена в иерархии по текущему поставщику."""
+
+        if self.supplier_id is None:
+            return '/'
+        return self.supplier.subtree_prefix
+
+    @staticmethod
+    def level_of(path):
+        """Метод возвращает уровень звена по его пути: количество поставщиков в цепочке."""
+
+        return path.count('/') - 1
+
+    def save(self, *args, **kwargs):
+        """Метод пересчитывает путь и уровень звена и, если поставщик изменился, переносит всех его потомков. Суммы
+        по поддеревьям звена и его поставщиков изменяются на разницу задолженности и при переносе звена. Поля
+        <subtree_debt> и <subtree_count> изменяются только выражениями F(), поэтому сохранение объекта не
+        перезаписывает их устаревшими значениями; после изменения объекта их актуальные значения есть только в базе
+        данных. Потомки переносятся до сохранения звена, чтобы к сигналу post_save они уже находились под его новым
+        путем. Изменение задолженности записывается в журнал DebtTransaction. Звено, его поставщики, новый поставщик с
+        его поставщиками и, при смене поставщика, потомки звена блокируются одним запросом методом
+        lock_with_suppliers в порядке id, как и в задаче propagate_debt_rollups, поэтому они не блокируют друг друга
+        взаимно."""
+
+        update_fields = kwargs.get('update_fields')
+        moving = update_fields is None or 'supplier' in update_fields
+        self.debt = self._meta.get_field('debt').to_python(self.debt)
+        with transaction.atomic():
+            supplier_ids = [self.supplier_id] if moving and self.supplier_id is not None else []
+            old = None
+            if self.pk is not None:
+                paths = Sale.lock_with_suppliers([self.pk, *supplier_ids], subtree_ids=[self.pk] if moving else ())
+                old = Sale.objects.filter(pk=self.pk).values('path', 'debt', *ROLLUP_FIELDS).first()
+            else:
+                paths = Sale.lock_with_suppliers(supplier_ids)
+            if moving:
+                if self.supplier_id in paths:
+                    self.supplier.path = paths[self.supplier_id]
+                self.path = self.build_path()
+                self.level = self.level_of(self.path)
+
+            if old is None:
+                self.subtree_debt, self.subtree_count = self.debt, 1
+                super().save(*args, **kwargs)
+                Sale.apply_rollup({pk: (self.debt, 1) for pk in self.ancestor_ids})
+                DebtTransaction.record_adjustment(self.pk, self.debt)
+                return
+
+            fields = set(update_fields) if update_fields is not None else {
+                field.name for field in self._meta.concrete_fields if not field.primary_key}
+            if 'supplier' in fields:
+                fields |= {'path', 'level'}
+            kwargs['update_fields'] = fields - set(ROLLUP_FIELDS)
+            if old['path'] != self.path:
+                Sale.move_subtree(f'{old["path"]}{self.pk}/', self.subtree_prefix)
+            super().save(*args, **kwargs)
+
+            debt_delta = self.debt - old['debt'] if 'debt' in fields else Decimal(0)
+            DebtTransaction.record_adjustment(self.pk, debt_delta)
+            deltas = defaultdict(lambda: (Decimal(0), 0))
+            deltas[self.pk] = (debt_delta, 0)
+            if old['path'] != self.path:
+                for pk in self.ids_of(old['path']):
+                    deltas[pk] = (-old['subtree_debt'], -old['subtree_count'])
+                for pk in self.ancestor_ids:
+                    debt, count = deltas[pk]
+                    deltas[pk] = (debt + old['subtree_debt'] + debt_delta, count + old['subtree_count'])
+            else:
+                for pk in self.ancestor_ids:
+                    deltas[pk] = (debt_delta, 0)
+            Sale.apply_rollup(deltas)
+
+    @classmethod
+    def move_subtree(cls, old_prefix, new_prefix):
+        """Метод одним запросом заменяет префикс <old_prefix> на <new_prefix> в путях всех потомков звена и сдвигает
+        их уровни."""
+
+        cls.objects.filter(path__startswith=old_prefix).update(
+            path=Concat(Value(new_prefix), Substr('path', len(old_prefix) + 1), output_field=models.CharField()),
+            level=F('level') + cls.level_of(new_prefix) - cls.level_of(old_prefix),
+        )
+
+    @classmethod
+    def lock_with_suppliers(cls, sale_ids, subtree_ids=()):
+        """Метод блокирует звенья <sale_ids>, всех их поставщиков и потомков звеньев <subtree_ids> одним запросом в
+        порядке id и возвращает словарь {id звена: путь} звеньев <sale_ids> без удаленных. Если путь звена изменился до
+        получения блокировки, блокировка повторяется по новому пути, поэтому возвращенные пути не изменятся до конца
+        транзакции."""
+
+        paths = dict(cls.objects.filter(pk__in=sale_ids).values_list('pk', 'path'))
+        while True:
+            pks = {pk for path in paths.values() for pk in cls.ids_of(path)} | set(paths)
+            prefixes = [f'{paths[pk]}{pk}/' for pk in subtree_ids if pk in paths]
+            if prefixes:
+                pks.update(cls.objects.filter(
+                    reduce(or_, (Q(path__startswith=prefix) for prefix in prefixes))).values_list('pk', flat=True))
+            locked = dict(cls.objects.select_for_update().filter(pk__in=pks).order_by('pk').values_list('pk', 'path'))
+            current = {pk: locked[pk] for pk in paths if pk in locked}
+            if current == paths:
+                return paths
+            paths = current
+
+    @classmethod
+    def apply_rollup(cls, deltas):
+        """Метод прибавляет к полям <subtree_debt> и <subtree_count> звеньев разницы из словаря
+        {id звена: (разница задолженности, разница количества)}. Строки изменяются в порядке id пачками по
+        ROLLUP_BATCH_SIZE, чтобы параллельные изменения не блокировали друг друга взаимно."""
+
+        deltas = {pk: delta for pk, delta in deltas.items() if any(delta)}
+        pks = sorted(deltas)
+        debt_field = models.DecimalField(max_digits=150, decimal_places=2)
+        for start in range(0, len(pks), ROLLUP_BATCH_SIZE):
+            batch = pks[start:start + ROLLUP_BATCH_SIZE]
+            cls.objects.filter(pk__in=batch).update(
+                subtree_debt=F('subtree_debt') + Case(
+                    *(When(pk=pk, then=Value(deltas[pk][0])) for pk in batch), output_field=debt_field),
+                subtree_count=F('subtree_count') + Case(
+                    *(When(pk=pk, then=Value(deltas[pk][1])) for pk in batch),
+                    output_field=models.IntegerField()),
+            )
+
     class Meta:
         verbose_name = 'Сеть'
         verbose_name_plural = 'Сети'
+
+
+class DebtWriteOff(models.Model):
+    class Statuses(models.TextChoices):
+        PENDING = ('pending', 'В очереди')
+        RUNNING = ('running', 'Выполняется')
+        DONE = ('done', 'Завершено')
+        FAILED = ('failed', 'Ошибка')
+    status = models.CharField(max_length=10, choices=Statuses.choices, default=Statuses.PENDING,
+                              verbose_name='Статус')
+    sale_ids = models.JSONField(verbose_name='Звенья')
+    total = models.PositiveIntegerField(verbose_name='Всего звеньев')
+    processed = models.PositiveIntegerField(default=0, verbose_name='Обработано звеньев')
+    last_pk = models.BigIntegerField(default=0, verbose_name='Последнее обработанное звено')
+    created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, verbose_name='Инициатор', **NULLABLE)
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated = models.DateTimeField(auto_now=True, verbose_name='Изменено')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    def __str__(self):
+        return f'Погашение задолженностей №{self.pk} ({self.processed}/{self.total})'
+
+    class Meta:
+        verbose_name = 'Погашение задолженностей'
+        verbose_name_plural = 'Погашения задолженностей'
+
+
+class DebtTransaction(models.Model):
+    """Операция журнала задолженности звена. Журнал только дополняется: <amount> — изменение задолженности со знаком
+    (начисление положительное, оплата и списание отрицательные), сумма операций звена равна его задолженности."""
+
+    class Kinds(models.TextChoices):
+        CHARGE = ('charge', 'Начисление')
+        PAYMENT = ('payment', 'Оплата')
+        WRITE_OFF = ('write_off', 'Списание')
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='debt_transactions', verbose_name='Звено')
+    kind = models.CharField(max_length=10, choices=Kinds.choices, verbose_name='Вид операции')
+    amount = models.DecimalField(max_digits=150, decimal_places=2, verbose_name='Сумма')
+    created = models.DateTimeField(default=timezone.now, verbose_name='Создано')
+    created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, verbose_name='Автор', **NULLABLE)
+    rolled_up = models.BooleanField(default=True, verbose_name='Учтена в суммах по поддеревьям')
+
+    SIGNS = {Kinds.CHARGE: 1, Kinds.PAYMENT: -1, Kinds.WRITE_OFF: -1}
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.amount} ({self.sale_id})'
+
+    @classmethod
+    def kind_of(cls, delta):
+        """Метод возвращает вид операции для изменения задолженности без явного вида (начальная задолженность,
+        изменение при сохранении): положительное — начисление, отрицательное — оплата."""
+
+        return cls.Kinds.CHARGE if delta > 0 else cls.Kinds.PAYMENT
+
+    @classmethod
+    def record_adjustment(cls, sale_id, delta, created_by=None):
+        """Метод записывает в журнал изменение задолженности, уже примененное к звену, с видом по знаку
+        (метод kind_of)."""
+
+        if not delta:
+            return None
+        return cls.objects.create(sale_id=sale_id, kind=cls.kind_of(delta), amount=delta, created_by=created_by)
+
+    @classmethod
+    def post(cls, sale_id, kind, amount, created_by=None):
+        """Метод проводит операцию: добавляет строку в журнал и изменяет задолженность звена выражением F(). Суммы по
+        поддеревьям звена и его поставщиков изменяются позже пачками задачей propagate_debt_rollups, которая ставится
+        после фиксации транзакции. Проводка блокирует только строку звена, поэтому параллельные проводки по разным
+        звеньям одной сети не ожидают друг друга на строке завода; до выполнения задачи поля <subtree_debt> звена и
+        его поставщиков не учитывают операцию. Транзакция не затрагивает потомков звена: их ответы только удаляются
+        из кэша."""
+        from sales.caches import invalidate_sales
+        from sales.tasks import propagate_debt_rollups
+
+        delta = cls.SIGNS[kind] * Decimal(amount)
+        with transaction.atomic():
+            path = Sale.objects.select_for_update().values_list('path', flat=True).get(pk=sale_id)
+            row = cls.objects.create(sale_id=sale_id, kind=kind, amount=delta, created_by=created_by, rolled_up=False)
+            Sale.objects.filter(pk=sale_id).update(debt=F('debt') + delta, updated_at=timezone.now())
+            invalidate_sales([(sale_id, path)], touch=False)
+            transaction.on_commit(propagate_debt_rollups.delay)
+        return row
+
+    @classmethod
+    def propagate_rollups(cls, limit=ROLLUP_BATCH_SIZE):
+        """Метод прибавляет к суммам по поддеревьям звеньев и их поставщиков не более <limit> операций, проведенных
+        методом post и еще не учтенных в суммах. Операции одного звена складываются, а звенья и поставщики
+        блокируются одним запросом в порядке id, поэтому строка завода изменяется один раз на пачку. Операции,
+        заблокированные параллельным вызовом, пропускаются. Возвращает количество учтенных операций."""
+
+        with transaction.atomic():
+            rows = list(cls.objects.select_for_update(skip_locked=True).filter(rolled_up=False).order_by(
+                'pk').values_list('pk', 'sale_id', 'amount')[:limit])
+            if not rows:
+                return 0
+            totals = defaultdict(Decimal)
+            for _, sale_id, amount in rows:
+                totals[sale_id] += amount
+            deltas = defaultdict(lambda: (Decimal(0), 0))
+            for sale_id, path in Sale.lock_with_suppliers(totals).items():
+                for pk in (*Sale.ids_of(path), sale_id):
+                    deltas[pk] = (deltas[pk][0] + totals[sale_id], 0)
+            Sale.apply_rollup(deltas)
+            cls.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(rolled_up=True)
+        return len(rows)
+
+    @classmethod
+    def balance_at(cls, sale_id, moment):
+        """Метод возвращает задолженность звена на момент <moment>: баланс ближайшего предшествующего снимка
+        DebtSnapshot плюс операции после него."""
+
+        snapshot = DebtSnapshot.objects.filter(sale_id=sale_id, taken_at__lte=moment).order_by('-taken_at').first()
+        tail = cls.objects.filter(sale_id=sale_id, created__lte=moment)
+        balance = Decimal(0)
+        if snapshot is not None:
+            tail = tail.filter(created__gt=snapshot.taken_at)
+            balance = snapshot.balance
+        return balance + (tail.aggregate(total=models.Sum('amount'))['total'] or Decimal(0))
+
+    class Meta:
+        verbose_name = 'Операция по задолженности'
+        verbose_name_plural = 'Операции по задолженности'
+        indexes = [
+            models.Index(fields=('sale', 'created'), name='sales_debt_tx_sale_created'),
+            models.Index(fields=('id',), condition=Q(rolled_up=False), name='sales_debt_tx_pending_rollup'),
+        ]
+
+
+class DebtSnapshot(models.Model):
+    """Снимок задолженности звена на момент <taken_at>: сумма всех операций журнала, созданных не позже этого
+    момента."""
+
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='debt_snapshots', verbose_name='Звено')
+    balance = models.DecimalField(max_digits=150, decimal_places=2, verbose_name='Задолженность')
+    taken_at = models.DateTimeField(verbose_name='Момент снимка')
+
+    def __str__(self):
+        return f'{self.balance} на {self.taken_at} ({self.sale_id})'
+
+    class Meta:
+        verbose_name = 'Снимок задолженности'
+        verbose_name_plural = 'Снимки задолженности'
+        indexes = [models.Index(fields=('sale', 'taken_at'), name='sales_debt_snap_sale_taken')]
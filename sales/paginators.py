@@ -0,0 +1,18 @@
+from config.pagination import KeysetPagination
+
+
+class SaleCursorPagination(KeysetPagination):
+    """Пагинация списка объектов модели Sale по ключу (created, id). Размер страницы задается параметром
+    <page_size>."""
+
+    ordering = ('-created', '-id')
+    page_size = 50
+    max_page_size = 500
+
+
+class DebtTransactionPagination(KeysetPagination):
+    """Пагинация журнала задолженности звена по ключу (created, id), новые операции первыми."""
+
+    ordering = ('-created', '-id')
+    page_size = 100
+    max_page_size = 1000
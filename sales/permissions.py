@@ -5,28 +5,34 @@ class IsActiveAndIsOwner(BasePermission):
     """
     Доступ разрешен только активированным пользователям. Детали записей могут смотреть только владельцы записей.
     Пользователь может видеть список всех объектов без возможности их как-то редактировать или удалять, если он не
-    является их владельцем.
+    является их владельцем. Владельцы сравниваются по идентификаторам; если объект получен через
+    Sale.objects.with_ownership(), согласованность владельцев продукта и контакта уже вычислена в запросе.
     """
     def has_permission(self, request, view):
         if request.user.is_active:
             return True
         return False
 
+    @staticmethod
+    def owners_match(obj):
+        """Метод проверяет, что продукт и контакт звена принадлежат владельцу звена."""
+
+        owners_match = getattr(obj, 'owners_match', None)
+        if owners_match is None:
+            return obj.product.product_user_id == obj.sale_user_id == obj.contact.contact_user_id
+        return owners_match
+
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
-            if obj.product.product_user != obj.sale_user:
+            if not self.owners_match(obj):
                 return False
-            if obj.contact.contact_user != obj.sale_user:
-                return False
-            return request.user == obj.sale_user
+            return request.user.pk == obj.sale_user_id
         elif request.method in ('PATCH', 'PUT', 'POST'):
-            if obj.product.product_user != obj.sale_user:
-                return False
-            if obj.contact.contact_user != obj.sale_user:
+            if not self.owners_match(obj):
                 return False
-            return request.user == obj.sale_user
+            return request.user.pk == obj.sale_user_id
         elif request.method == 'DELETE':
             if not request.user.is_active:
                 return False
-            return request.user == obj.sale_user or request.user.is_superuser
+            return request.user.pk == obj.sale_user_id or request.user.is_superuser
         return False
@@ -0,0 +1,37 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+from sales.exporters import Echo
+
+
+class CSVRenderer(BaseRenderer):
+    """Рендерер выгрузки в формате CSV. Строки выгрузки передаются потоковым ответом без рендерера, сам рендерер нужен
+    для согласования формата по заголовку Accept и для ответов с ошибками: поля ошибки выводятся заголовком, их
+    значения — строкой."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        writer = csv.writer(Echo())
+        return (writer.writerow(data.keys()) + writer.writerow(map(str, data.values()))).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Рендерер выгрузки в формате NDJSON; ответ с ошибкой выводится одной строкой JSON."""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode(self.charset)
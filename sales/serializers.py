@@ -1,17 +1,42 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
 from rest_framework import serializers
+from rest_framework.fields import empty
 
+from config.serializers import SparseFieldsetMixin
+from contacts.models import Contact
 from contacts.serializers import ContactSerializer
+from products.models import Product
 from products.serializers import ProductSerializer
-from sales.models import Sale
+from sales.loaders import load_suppliers
+from sales.models import Sale, DebtTransaction
 from sales.validators import SupplierValidator, ProductValidator, ContactValidator
+from users.fields import UserEmailField
 from users.models import User
 
 
-class SaleRetrieveSerializer(serializers.ModelSerializer):
+class SupplierChainListSerializer(serializers.ListSerializer):
+    """Сериализатор списка объектов Sale. Перед сериализацией пакетно загружает цепочки поставщиков всех объектов, если
+    поле <supplier> входит в ответ."""
+
+    def to_representation(self, data):
+        sales = list(data.all() if isinstance(data, models.Manager) else data)
+        if 'supplier' in self.child.fields:
+            load_suppliers(sales, self.child.related_fields)
+        return super().to_representation(sales)
+
+
+class SaleRetrieveSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для получения детальной информации конкретного объекта. """
 
+    related_fields = ('sale_user', 'product__product_user', 'contact__contact_user')
+    related_by_field = {'sale_user': ('sale_user',), 'product': ('product__product_user',),
+                        'contact': ('contact__contact_user',)}
+
     supplier = serializers.SerializerMethodField()
-    sale_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+    sale_user = UserEmailField()
     product = ProductSerializer(read_only=True)
     contact = ContactSerializer(read_only=True)
 
@@ -19,6 +44,12 @@ class SaleRetrieveSerializer(serializers.ModelSerializer):
         model = Sale
         fields = ('id', 'title', 'unit', 'supplier', 'created', 'product', 'contact', 'sale_user', 'debt')
         validators = [SupplierValidator(unit='unit', supplier='supplier')]
+        list_serializer_class = SupplierChainListSerializer
+
+    def to_representation(self, instance):
+        if 'supplier' in self.fields:
+            load_suppliers([instance], self.related_fields)
+        return super().to_representation(instance)
 
     def get_supplier(self, instance):
         """Метод для получения информации поля <supplier>."""
@@ -31,7 +62,7 @@ class SaleRetrieveSerializer(serializers.ModelSerializer):
 class SaleSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и изменения информации об объекте. """
 
-    sale_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+    sale_user = UserEmailField()
 
     class Meta:
         model = Sale
@@ -51,16 +82,25 @@ class SaleSerializer(serializers.ModelSerializer):
         return instance
 
 
-class SaleListSerializer(serializers.ModelSerializer):
+class SaleListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для получения информации об объектах. """
 
-    sale_user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
+    related_fields = ('sale_user', 'contact__contact_user')
+    related_by_field = {'sale_user': ('sale_user',), 'contact': ('contact__contact_user',)}
+
+    sale_user = UserEmailField()
     supplier = serializers.SerializerMethodField()
     contact = ContactSerializer(read_only=True)
 
     class Meta:
         model = Sale
         fields = ('id', 'title', 'unit', 'supplier', 'sale_user', 'contact')
+        list_serializer_class = SupplierChainListSerializer
+
+    def to_representation(self, instance):
+        if 'supplier' in self.fields:
+            load_suppliers([instance], self.related_fields)
+        return super().to_representation(instance)
 
     def get_supplier(self, instance):
         """Метод для получения информации поля <supplier>."""
@@ -68,3 +108,182 @@ class SaleListSerializer(serializers.ModelSerializer):
         if instance.supplier is not None:
             return SaleListSerializer(instance.supplier).data
         return []
+
+
+class SaleRollupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Сериализатор для получения задолженности и количества звеньев всей сети, которую снабжает объект. """
+
+    class Meta:
+        model = Sale
+        fields = ('id', 'title', 'subtree_debt', 'subtree_count')
+
+
+class SaleBulkCreateListSerializer(serializers.ListSerializer):
+    """Сериализатор пачки создаваемых объектов Sale. Все продукты, контакты, поставщики и пользователи пачки
+    загружаются несколькими запросами IN, после чего правила SupplierValidator, ProductValidator и ContactValidator
+    проверяются в памяти, в том числе для поставщиков из этой же пачки. Ошибки возвращаются списком по строкам."""
+
+    max_batch_size = 10000
+    validators_for_row = [SupplierValidator(unit='unit', supplier='supplier'),
+                          ProductValidator(product_user='product', sale_user='sale_user'),
+                          ContactValidator(contact='contact', sale_user='sale_user')]
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', self.max_batch_size)
+        super().__init__(*args, **kwargs)
+
+    def run_validation(self, data=empty):
+        rows = super().run_validation(data)
+        request_user = self.context['request'].user
+        products = Product.objects.select_related('product_user').in_bulk({row['product'] for row in rows})
+        contacts = Contact.objects.select_related('contact_user').in_bulk({row['contact'] for row in rows})
+        suppliers = Sale.objects.only('id', 'unit', 'path', 'level').in_bulk(
+            {row['supplier'] for row in rows if row.get('supplier') is not None})
+        users = {user.email: user for user in User.objects.filter(email__in={row['sale_user'] for row in rows})}
+
+        errors, validated = [], []
+        for index, row in enumerate(rows):
+            error = {}
+            supplier, supplier_index = row.get('supplier'), row.get('supplier_index')
+            if supplier is not None and supplier_index is not None:
+                error['supplier'] = ['Укажите либо поставщика, либо номер строки поставщика в пачке.']
+            elif supplier is not None:
+                supplier = suppliers.get(supplier)
+                if supplier is None:
+                    error['supplier'] = [self._does_not_exist(serializers.PrimaryKeyRelatedField,
+                                                              pk_value=row['supplier'])]
+            elif supplier_index is not None:
+                if supplier_index >= index:
+                    error['supplier_index'] = ['Поставщик должен быть указан в пачке раньше звена.']
+                elif errors[supplier_index]:
+                    error['supplier_index'] = ['Строка поставщика содержит ошибки.']
+                else:
+                    supplier = validated[supplier_index]['sale']
+
+            value = {'unit': row['unit'], 'supplier': supplier, 'product': products.get(row['product']),
+                     'contact': contacts.get(row['contact']), 'sale_user': users.get(row['sale_user'])}
+            for name, field in (('product', serializers.PrimaryKeyRelatedField),
+                                ('contact', serializers.PrimaryKeyRelatedField)):
+                if value[name] is None:
+                    error[name] = [self._does_not_exist(field, pk_value=row[name])]
+            if value['sale_user'] is None:
+                error['sale_user'] = [self._does_not_exist(serializers.SlugRelatedField, slug_name='email',
+                                                           value=row['sale_user'])]
+            elif value['sale_user'] != request_user:
+                error['sale_user'] = ['Вы указали чужого пользователя']
+            if not error:
+                for validator in self.validators_for_row:
+                    try:
+                        if getattr(validator, 'requires_context', False):
+                            validator(value, self.child)
+                        else:
+                            validator(value)
+                    except serializers.ValidationError as exc:
+                        error.update(serializers.as_serializer_error(exc))
+
+            errors.append(error)
+            sale = None if error else self._build_sale(row, value)
+            validated.append({'sale': sale, 'supplier_index': supplier_index})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    @staticmethod
+    def _does_not_exist(field, **kwargs):
+        return str(field.default_error_messages['does_not_exist']).format(**kwargs)
+
+    @staticmethod
+    def _build_sale(row, value):
+        """Метод создает несохраненный объект Sale строки. Уровень и суммы по поддереву вычисляются сразу, путь — при
+        сохранении, когда станут известны идентификаторы поставщиков из пачки."""
+
+        sale = Sale(title=row['title'], unit=row['unit'], product=value['product'], contact=value['contact'],
+                    sale_user=value['sale_user'], debt=row['debt'], subtree_debt=row['debt'], subtree_count=1)
+        supplier = value['supplier']
+        if supplier is not None:
+            sale.level = supplier.level + 1
+            if supplier.pk is not None:
+                sale.supplier = supplier
+                sale.path = supplier.subtree_prefix
+        return sale
+
+    def create(self, validated_data):
+        """Метод сохраняет пачку через bulk_create по уровням внутри пачки (не больше трех запросов), одним
+        изменением добавляет сети новых звеньев в суммы по поддеревьям существующих поставщиков и одним запросом
+        записывает начальные задолженности в журнал."""
+
+        sales = [item['sale'] for item in validated_data]
+        parents = [item['supplier_index'] for item in validated_data]
+        for index in reversed(range(len(sales))):
+            if parents[index] is not None:
+                sales[parents[index]].subtree_debt += sales[index].subtree_debt
+                sales[parents[index]].subtree_count += sales[index].subtree_count
+
+        depths = []
+        for parent in parents:
+            depths.append(0 if parent is None else depths[parent] + 1)
+        deltas = defaultdict(lambda: (Decimal(0), 0))
+        with transaction.atomic():
+            for depth in range(max(depths, default=-1) + 1):
+                group = [index for index in range(len(sales)) if depths[index] == depth]
+                for index in group:
+                    if parents[index] is not None:
+                        sales[index].supplier = sales[parents[index]]
+                        sales[index].path = sales[parents[index]].subtree_prefix
+                Sale.objects.bulk_create([sales[index] for index in group], batch_size=1000)
+            for sale, parent in zip(sales, parents):
+                if parent is None and sale.supplier_id is not None:
+                    for pk in sale.ancestor_ids:
+                        debt, count = deltas[pk]
+                        deltas[pk] = (debt + sale.subtree_debt, count + sale.subtree_count)
+            Sale.apply_rollup(deltas)
+            DebtTransaction.objects.bulk_create([
+                DebtTransaction(sale=sale, kind=DebtTransaction.kind_of(sale.debt), amount=sale.debt)
+                for sale in sales if sale.debt], batch_size=1000)
+        return sales
+
+
+class SaleBulkCreateSerializer(serializers.Serializer):
+    """Сериализатор строки пачки создаваемых объектов Sale. Поставщик задается либо идентификатором существующего
+    объекта <supplier>, либо номером строки этой же пачки <supplier_index>."""
+
+    title = serializers.CharField(max_length=150)
+    unit = serializers.ChoiceField(choices=Sale.Kinds.choices, default=Sale.Kinds.FACTORY)
+    supplier = serializers.IntegerField(required=False, allow_null=True)
+    supplier_index = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    product = serializers.IntegerField()
+    contact = serializers.IntegerField()
+    sale_user = serializers.CharField(max_length=150)
+    debt = serializers.DecimalField(max_digits=150, decimal_places=2)
+
+    class Meta:
+        list_serializer_class = SaleBulkCreateListSerializer
+
+
+class DebtTransactionSerializer(serializers.ModelSerializer):
+    """Сериализатор операции журнала задолженности. Сумма вводится положительной, знак определяется видом операции;
+    в ответе сумма возвращается со знаком. Звено операции передается в контексте <sale>."""
+
+    created_by = UserEmailField(read_only=True)
+
+    class Meta:
+        model = DebtTransaction
+        fields = ('id', 'kind', 'amount', 'created', 'created_by')
+        read_only_fields = ('created',)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Сумма операции должна быть положительной.')
+        return value
+
+    def create(self, validated_data):
+        return DebtTransaction.post(self.context['sale'].pk, validated_data['kind'], validated_data['amount'],
+                                    created_by=self.context['request'].user)
+
+
+class DebtBalanceSerializer(serializers.Serializer):
+    """Сериализатор задолженности звена на момент <at>."""
+
+    id = serializers.IntegerField()
+    at = serializers.DateTimeField()
+    debt = serializers.DecimalField(max_digits=150, decimal_places=2)
@@ -0,0 +1,59 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from contacts.models import Contact
+from products.models import Product
+from sales.caches import invalidate_sales, invalidate_sales_where
+from sales.models import Sale
+from users.models import User
+
+
+@receiver(pre_delete, sender=Sale)
+def detach_sale_subtree(sender, instance, **kwargs):
+    """При удалении звена его сеть вычитается из сумм по поддеревьям поставщиков, а потомки (поставщик которых
+    обнулится) переносятся в корень иерархии. Значения читаются из базы данных, так как при удалении нескольких звеньев
+    сразу они могли измениться после загрузки объекта. Звено, его поставщики и потомки блокируются в порядке id."""
+
+    Sale.lock_with_suppliers([instance.pk], subtree_ids=[instance.pk])
+    sale = Sale.objects.filter(pk=instance.pk).values('path', 'subtree_debt', 'subtree_count').first()
+    if sale is None:
+        return
+    invalidate_sales([(instance.pk, sale['path'])])
+    Sale.apply_rollup({pk: (-sale['subtree_debt'], -sale['subtree_count']) for pk in Sale.ids_of(sale['path'])})
+    Sale.move_subtree(f'{sale["path"]}{instance.pk}/', '/')
+
+
+@receiver(post_save, sender=Sale)
+def invalidate_sale(sender, instance, **kwargs):
+    """После изменения звена из кэша удаляется его детальная информация и информация обо всех его потомках."""
+
+    invalidate_sales([(instance.pk, instance.path)])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_sales(sender, instance, **kwargs):
+    """После изменения продукта из кэша удаляется информация о звеньях с этим продуктом и об их потомках."""
+
+    invalidate_sales_where(Q(product_id=instance.pk))
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def invalidate_contact_sales(sender, instance, **kwargs):
+    """После изменения контакта из кэша удаляется информация о звеньях с этим контактом и об их потомках."""
+
+    invalidate_sales_where(Q(contact_id=instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_sales(sender, instance, created, update_fields=None, **kwargs):
+    """Ответ звена содержит email владельцев звена, продукта и контакта, поэтому после изменения пользователя из
+    кэша удаляется информация о связанных с ним звеньях. Сохранения без изменения email (например, времени входа)
+    кэш не затрагивают."""
+
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    invalidate_sales_where(Q(sale_user_id=instance.pk) | Q(product__product_user_id=instance.pk)
+                           | Q(contact__contact_user_id=instance.pk))
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from sales.models import ROLLUP_BATCH_SIZE, Sale, DebtWriteOff, DebtTransaction, DebtSnapshot
+
+WRITE_OFF_CHUNK_SIZE = 500
+SNAPSHOT_CHUNK_SIZE = 2000
+SNAPSHOT_LAG = timedelta(minutes=5)
+WRITE_OFF_STALE_AFTER = timedelta(minutes=10)
+
+
+def resumable_write_off_jobs():
+    """Функция возвращает задания DebtWriteOff, которые можно запустить повторно: завершенные с ошибкой, а также
+    ожидающие и выполняющиеся, прогресс которых не сохранялся дольше WRITE_OFF_STALE_AFTER (поле <updated>
+    обновляется после каждой пачки, поэтому служит признаком того, что обработчик жив)."""
+
+    heartbeat = timezone.now() - WRITE_OFF_STALE_AFTER
+    return DebtWriteOff.objects.filter(
+        Q(status=DebtWriteOff.Statuses.FAILED)
+        | Q(status__in=(DebtWriteOff.Statuses.PENDING, DebtWriteOff.Statuses.RUNNING), updated__lt=heartbeat)
+    )
+
+
+@shared_task
+def write_off_debt(job_id, chunk_size=WRITE_OFF_CHUNK_SIZE):
+    """Обнуляет задолженности звеньев задания DebtWriteOff пачками в порядке id. Каждая пачка обрабатывается в
+    отдельной короткой транзакции вместе с сохранением прогресса задания, поэтому прерванное задание при повторном
+    запуске продолжается с первого необработанного звена. Задание захватывается условным UPDATE: выполняющееся
+    задание с недавним прогрессом повторно не запускается, поэтому звенья не обрабатываются дважды."""
+
+    claimable = resumable_write_off_jobs() | DebtWriteOff.objects.filter(status=DebtWriteOff.Statuses.PENDING)
+    claimed = claimable.filter(pk=job_id).update(status=DebtWriteOff.Statuses.RUNNING, error='', updated=timezone.now())
+    if not claimed:
+        return
+    job = DebtWriteOff.objects.get(pk=job_id)
+
+    pending = [pk for pk in sorted(job.sale_ids) if pk > job.last_pk]
+    try:
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            with transaction.atomic():
+                Sale.objects.filter(pk__in=chunk).write_off_debt()
+                job.processed += len(chunk)
+                job.last_pk = chunk[-1]
+                job.save(update_fields=('processed', 'last_pk', 'updated'))
+    except Exception as exc:
+        job.status = DebtWriteOff.Statuses.FAILED
+        job.error = str(exc)
+        job.save(update_fields=('status', 'error', 'updated'))
+        raise
+    job.status = DebtWriteOff.Statuses.DONE
+    job.save(update_fields=('status', 'updated'))
+
+
+@shared_task
+def propagate_debt_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """Переносит операции журнала, проведенные DebtTransaction.post, в суммы по поддеревьям звеньев и их поставщиков
+    пачками по <batch_size> операций, каждая в отдельной транзакции. Задача ставится после каждой проводки и
+    периодически, поэтому операции, задача которых не была доставлена, учитываются при следующем запуске."""
+
+    while DebtTransaction.propagate_rollups(batch_size):
+        pass
+
+
+@shared_task
+def take_debt_snapshots(chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """Создает снимки задолженности звеньев, по которым после их последнего снимка появились операции. Снимок
+    делается на момент, отстающий от текущего на SNAPSHOT_LAG, чтобы операции еще не зафиксированных транзакций не
+    оказались раньше снимка. Баланс снимка — баланс предыдущего снимка плюс операции после него, поэтому журнал
+    целиком не пересчитывается."""
+
+    taken_at = timezone.now() - SNAPSHOT_LAG
+    last = DebtSnapshot.objects.filter(sale=OuterRef('sale')).order_by('-taken_at')
+    tails = DebtTransaction.objects.filter(created__lte=taken_at).annotate(
+        last_taken_at=Subquery(last.values('taken_at')[:1]),
+    ).filter(
+        Q(last_taken_at__isnull=True) | Q(created__gt=F('last_taken_at')),
+    ).order_by().values_list('sale').annotate(tail=Sum('amount'))
+
+    chunk = []
+    for row in tails.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            _save_snapshots(chunk, taken_at)
+            chunk = []
+    _save_snapshots(chunk, taken_at)
+
+
+def _save_snapshots(tails, taken_at):
+    balances = dict(Sale.objects.filter(pk__in=[sale_id for sale_id, _ in tails]).annotate(
+        balance=Subquery(DebtSnapshot.objects.filter(sale=OuterRef('pk')).order_by('-taken_at').values('balance')[:1]),
+    ).values_list('pk', 'balance'))
+    DebtSnapshot.objects.bulk_create([
+        DebtSnapshot(sale_id=sale_id, balance=(balances.get(sale_id) or 0) + tail, taken_at=taken_at)
+        for sale_id, tail in tails if sale_id in balances
+    ])
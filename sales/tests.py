@@ -1,8 +1,35 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.utils import timezone
+import msgpack
+
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 
+from config.renderers import ORJSONRenderer
 from contacts.models import Contact
 from products.models import Product
-from sales.models import Sale
+from sales.caches import sale_cache_key
+from sales.exporters import export_rows
+from sales.importers import CsvImporter
+from sales.models import Sale, DebtWriteOff, DebtTransaction, DebtSnapshot
+from sales.serializers import SaleBulkCreateListSerializer
+from sales.tasks import write_off_debt, take_debt_snapshots, propagate_debt_rollups
+from users.models import User
 from users.tests import UserModelTestCase
 
 
@@ -10,6 +37,7 @@ from users.tests import UserModelTestCase
 class SaleModelTestCase(UserModelTestCase):
     def setUp(self) -> None:
         super().setUp()
+        cache.clear()
 
         # Создание объектов Product
         self.product_1 = Product.objects.create(
@@ -711,7 +739,7 @@ class SaleGetListTestCase(SaleModelTestCase):
         # Проверка на количество объектов
         self.assertEqual(
             Sale.objects.count(),
-            len(response.json())
+            len(response.json()['results'])
         )
 
     def test_user_cannot_get_list_sale_without_authentication(self):
@@ -1050,3 +1078,1098 @@ class SaleDeleteTestCase(SaleModelTestCase):
             response.json(),
             {'detail': 'Учетные данные не были предоставлены.'}
         )
+
+
+class SaleHierarchyTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Получение маршрутов
+        self.sale_list_url = '/sales/'
+
+    def test_path_is_built_from_suppliers(self):
+        """Поле <path> содержит идентификаторы всех поставщиков звена."""
+
+        # Проверка путей звеньев разных уровней
+        self.assertEqual(self.sale_factory_1.path, '/')
+        self.assertEqual(self.sale_retail_1.path, f'/{self.sale_factory_1.pk}/')
+        self.assertEqual(
+            self.sale_businessman_1.path,
+            f'/{self.sale_factory_1.pk}/{self.sale_retail_1.pk}/'
+        )
+
+    def test_path_of_descendants_changes_with_supplier(self):
+        """При смене поставщика пути всех потомков звена изменяются."""
+
+        # Смена поставщика розничной сети
+        self.sale_retail_1.supplier = self.sale_factory_2
+        self.sale_retail_1.save()
+
+        # Проверка пути потомка
+        self.sale_businessman_1.refresh_from_db()
+        self.assertEqual(
+            self.sale_businessman_1.path,
+            f'/{self.sale_factory_2.pk}/{self.sale_retail_1.pk}/'
+        )
+
+    def test_path_of_descendants_changes_after_supplier_deletion(self):
+        """При удалении звена его потомки становятся корнями иерархии."""
+
+        # Удаление завода вместе с розничной сетью
+        Sale.objects.filter(pk__in=(self.sale_factory_1.pk, self.sale_retail_1.pk)).delete()
+
+        # Проверка пути потомка
+        self.sale_businessman_1.refresh_from_db()
+        self.assertEqual(self.sale_businessman_1.path, '/')
+
+    def test_level_of_descendants_changes_with_supplier(self):
+        """При переносе звена в корень иерархии уровни всех его потомков пересчитываются."""
+
+        # Проверка уровней до переноса
+        self.assertEqual(self.sale_retail_1.level, 1)
+        self.assertEqual(self.sale_businessman_1.level, 2)
+
+        # Перенос розничной сети в корень иерархии
+        self.sale_retail_1.supplier = None
+        self.sale_retail_1.save()
+
+        # Проверка уровня потомка
+        self.sale_businessman_1.refresh_from_db()
+        self.assertEqual(self.sale_businessman_1.level, 1)
+
+    def test_user_cannot_update_sale_supplier_to_descendant(self):
+        """Пользователи не могут назначать поставщиком звена его потомка."""
+
+        # Перенос розничной сети в корень иерархии
+        self.sale_retail_1.supplier = None
+        self.sale_retail_1.save()
+
+        # PATCH-запрос на назначение потомка поставщиком
+        response = self.client.patch(
+            f'/sales/update/{self.sale_retail_1.pk}/',
+            {'supplier': self.sale_businessman_1.pk, 'sale_user': 'test@test.com'},
+            headers=self.headers_user_1,
+            format='json'
+        )
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+        # Проверка содержимого ответа
+        self.assertEqual(
+            response.json(),
+            {'supplier_cycle': ['Звено не может ссылаться на себя или на своих потомков.']}
+        )
+
+    def test_level_migration_stops_on_supplier_cycle(self):
+        """Миграция заполнения уровней не зацикливается на цикле поставщиков, а прерывается со списком звеньев."""
+
+        fill_levels = import_module('sales.migrations.0003_sale_level').fill_levels
+        Sale.objects.filter(pk=self.sale_factory_1.pk).update(supplier=self.sale_businessman_1, path='/')
+        Sale.objects.filter(pk__in=(self.sale_retail_1.pk, self.sale_businessman_1.pk)).update(path='/')
+
+        message = f'{self.sale_factory_1.pk} (поставщик {self.sale_businessman_1.pk})'
+        with self.assertRaisesMessage(RuntimeError, message):
+            fill_levels(apps, None)
+
+    def test_user_cannot_move_subtree_below_third_level(self):
+        """Звено с потомками нельзя перенести так, чтобы его потомки оказались глубже третьего уровня."""
+
+        # Предприниматель первого уровня
+        businessman = Sale.objects.create(
+            unit='Индивидуальный предприниматель',
+            title='Индивидуальный предприниматель 3',
+            supplier=self.sale_factory_1,
+            sale_user=self.user_test,
+            product=self.product_1,
+            contact=self.contact_1,
+            debt=0.00,
+        )
+
+        # Перенос розничной сети с потомком под предпринимателя первого уровня
+        response = self.client.patch(
+            f'/sales/update/{self.sale_retail_1.pk}/',
+            {'supplier': businessman.pk, 'sale_user': 'test@test.com'},
+            headers=self.headers_user_1,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'count_supplier': ['Уровень вложенности не должен превышать 3.']})
+
+        # Звено без потомков можно перенести на второй уровень
+        response = self.client.patch(
+            f'/sales/update/{self.sale_businessman_1.pk}/',
+            {'supplier': self.sale_retail_2.pk, 'sale_user': 'test@test.com', 'product': self.product_1.pk,
+             'contact': self.contact_1.pk},
+            headers=self.headers_user_1,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_can_filter_and_order_sales_by_level(self):
+        """Активные пользователи могут фильтровать и сортировать объекты Sale по уровню иерархии."""
+
+        # GET-запрос на получение звеньев второго уровня
+        response = self.client.get(self.sale_list_url, {'level': 2}, headers=self.headers_user_1)
+
+        # Проверка полученных объектов
+        self.assertEqual(
+            sorted(sale['id'] for sale in response.json()['results']),
+            sorted([self.sale_businessman_1.pk, self.sale_businessman_2.pk])
+        )
+
+        # GET-запрос на получение звеньев, отсортированных по уровню
+        response = self.client.get(self.sale_list_url, {'ordering': '-level'}, headers=self.headers_user_1)
+
+        # Проверка порядка объектов
+        self.assertEqual(
+            response.json()['results'][0]['unit'],
+            'Индивидуальный предприниматель'
+        )
+
+    def test_user_can_filter_sales_under_supplier(self):
+        """Активные пользователи могут получить всех потомков звена."""
+
+        # GET-запрос на получение потомков завода
+        response = self.client.get(
+            self.sale_list_url,
+            {'under': self.sale_factory_1.pk},
+            headers=self.headers_user_1,
+        )
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+        # Проверка полученных объектов
+        self.assertEqual(
+            sorted(sale['id'] for sale in response.json()['results']),
+            sorted([self.sale_retail_1.pk, self.sale_businessman_1.pk])
+        )
+
+    def test_user_can_filter_ancestors_of_sale(self):
+        """Активные пользователи могут получить всех поставщиков звена."""
+
+        # GET-запрос на получение поставщиков ИП
+        response = self.client.get(
+            self.sale_list_url,
+            {'ancestors_of': self.sale_businessman_2.pk},
+            headers=self.headers_user_1,
+        )
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+        # Проверка полученных объектов
+        self.assertEqual(
+            sorted(sale['id'] for sale in response.json()['results']),
+            sorted([self.sale_factory_2.pk, self.sale_retail_2.pk])
+        )
+
+
+class SaleSupplierLoadingTestCase(SaleModelTestCase):
+    def test_list_queries_do_not_depend_on_number_of_sales(self):
+        """Количество запросов при получении списка объектов Sale не зависит от количества объектов."""
+
+        # Запросы: пользователь, ETag списка, список объектов и два уровня поставщиков
+        with self.assertNumQueries(5):
+            response = self.client.get('/sales/', headers=self.headers_user_1)
+
+        # Проверка цепочки поставщиков
+        businessman = next(sale for sale in response.json()['results'] if sale['id'] == self.sale_businessman_1.pk)
+        self.assertEqual(businessman['supplier']['id'], self.sale_retail_1.pk)
+        self.assertEqual(businessman['supplier']['supplier']['id'], self.sale_factory_1.pk)
+        self.assertEqual(businessman['supplier']['supplier']['supplier'], [])
+        self.assertEqual(businessman['supplier']['contact']['contact_user'], 'test@test.com')
+
+    def test_detail_queries_do_not_depend_on_supplier_chain(self):
+        """Количество запросов при получении объекта Sale не зависит от длины цепочки поставщиков."""
+
+        # Запросы: пользователь, объект и два уровня поставщиков
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/sales/{self.sale_businessman_1.pk}/', headers=self.headers_user_1)
+
+        # Проверка цепочки поставщиков
+        self.assertEqual(
+            response.json()['supplier']['supplier']['product']['product_user'],
+            'test@test.com'
+        )
+
+
+class SalePaginationTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Получение маршрутов
+        self.sale_list_url = '/sales/'
+
+    def test_user_can_walk_pages_forward_and_backward(self):
+        """Курсоры next и previous возвращают соседние страницы в порядке убывания (created, id)."""
+
+        # GET-запрос на получение первой страницы
+        response = self.client.get(self.sale_list_url, {'page_size': 4}, headers=self.headers_user_1)
+        first_page = response.json()
+
+        # Проверка первой страницы
+        self.assertEqual(len(first_page['results']), 4)
+        self.assertIsNone(first_page['previous'])
+        self.assertIsNotNone(first_page['next'])
+
+        # GET-запрос на получение второй страницы
+        response = self.client.get(first_page['next'], headers=self.headers_user_1)
+        second_page = response.json()
+
+        # Проверка второй страницы
+        self.assertEqual(len(second_page['results']), 2)
+        self.assertIsNone(second_page['next'])
+
+        # Проверка порядка объектов на всех страницах
+        expected = list(Sale.objects.order_by('-created', '-id').values_list('id', flat=True))
+        self.assertEqual(
+            [sale['id'] for sale in first_page['results'] + second_page['results']],
+            expected
+        )
+
+        # GET-запрос на возврат к первой странице
+        response = self.client.get(second_page['previous'], headers=self.headers_user_1)
+
+        # Проверка возврата к первой странице
+        self.assertEqual(response.json()['results'], first_page['results'])
+        self.assertIsNone(response.json()['previous'])
+
+    def test_user_gets_not_found_with_invalid_cursor(self):
+        """При некорректном курсоре возвращается ошибка 404."""
+
+        # GET-запрос с некорректным курсором
+        response = self.client.get(self.sale_list_url, {'cursor': 'invalid'}, headers=self.headers_user_1)
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+    def test_user_gets_not_found_with_tampered_cursor_values(self):
+        """Курсор со значениями, которые не соответствуют типам полей сортировки, возвращает ошибку 404."""
+
+        created = self.sale_factory_1.created.isoformat()
+        for position in (['abc', 1], [None, 1], [{'x': 1}, 1], [created, 'abc'], [created, [1]], [created, None]):
+            cursor = urlsafe_b64encode(json.dumps({'r': 0, 'p': position}).encode()).decode()
+            response = self.client.get(self.sale_list_url, {'cursor': cursor}, headers=self.headers_user_1)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_user_can_search_sales_by_city(self):
+        """Поиск по городу возвращает все подходящие объекты Sale на страницах курсора."""
+
+        # GET-запрос на поиск объектов по городу
+        response = self.client.get(
+            self.sale_list_url,
+            {'search': 'СПб', 'page_size': 2},
+            headers=self.headers_user_1
+        )
+        results = response.json()['results']
+
+        # GET-запрос на получение второй страницы
+        response = self.client.get(response.json()['next'], headers=self.headers_user_1)
+        results += response.json()['results']
+
+        # Проверка полученных объектов
+        self.assertEqual(
+            sorted(sale['id'] for sale in results),
+            sorted(Sale.objects.filter(contact=self.contact_1).values_list('id', flat=True))
+        )
+
+
+class SaleRollupTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Задолженности звеньев первой сети
+        for sale, debt in ((self.sale_factory_1, '100.00'), (self.sale_retail_1, '20.50'),
+                           (self.sale_businessman_1, '3.25')):
+            sale.debt = debt
+            sale.save()
+
+    def assertRollup(self, sale, debt, count):
+        sale.refresh_from_db()
+        self.assertEqual(sale.subtree_debt, Decimal(debt))
+        self.assertEqual(sale.subtree_count, count)
+
+    def test_rollup_is_updated_with_debt(self):
+        """Суммы по поддеревьям учитывают задолженность всех потомков."""
+
+        # Проверка сумм по поддеревьям
+        self.assertRollup(self.sale_factory_1, '123.75', 3)
+        self.assertRollup(self.sale_retail_1, '23.75', 2)
+        self.assertRollup(self.sale_businessman_1, '3.25', 1)
+
+    def test_rollup_is_updated_with_supplier(self):
+        """При смене поставщика сеть звена переносится в суммы нового поставщика."""
+
+        # Перенос розничной сети ко второму заводу
+        self.sale_retail_1.supplier = self.sale_factory_2
+        self.sale_retail_1.save()
+
+        # Проверка сумм по поддеревьям
+        self.assertRollup(self.sale_factory_1, '100.00', 1)
+        self.assertRollup(self.sale_factory_2, '23.75', 5)
+
+    def test_supplier_change_locks_all_rows_at_once(self):
+        """При смене поставщика звено, его сеть и оба поставщика с их цепочками блокируются одним вызовом
+        lock_with_suppliers (в порядке id), как и в задаче переноса операций журнала."""
+
+        self.sale_retail_1.supplier = self.sale_factory_2
+        with mock.patch.object(Sale, 'lock_with_suppliers', wraps=Sale.lock_with_suppliers) as lock:
+            self.sale_retail_1.save()
+        lock.assert_called_once_with([self.sale_retail_1.pk, self.sale_factory_2.pk],
+                                     subtree_ids=[self.sale_retail_1.pk])
+
+        # Путь берется из заблокированной строки поставщика
+        self.sale_retail_1.refresh_from_db()
+        self.assertEqual(self.sale_retail_1.path, f'/{self.sale_factory_2.pk}/')
+
+    def test_rollup_is_updated_after_deletion(self):
+        """При удалении звена его сеть вычитается из сумм поставщиков."""
+
+        # Удаление розничной сети
+        self.sale_retail_1.delete()
+
+        # Проверка сумм по поддеревьям
+        self.assertRollup(self.sale_factory_1, '100.00', 1)
+        self.assertRollup(self.sale_businessman_1, '3.25', 1)
+
+    def test_rollup_is_updated_after_write_off(self):
+        """Погашение задолженностей изменяет суммы по поддеревьям поставщиков."""
+
+        # Погашение задолженностей
+        Sale.objects.filter(pk=self.sale_retail_1.pk).write_off_debt()
+
+        # Проверка сумм по поддеревьям
+        self.assertRollup(self.sale_factory_1, '103.25', 3)
+        self.assertRollup(self.sale_retail_1, '3.25', 2)
+
+    def test_user_can_get_rollup(self):
+        """Активные пользователи могут получить суммы по сети своего объекта."""
+
+        # GET-запрос на получение сумм
+        response = self.client.get(f'/sales/rollup/{self.sale_factory_1.pk}/', headers=self.headers_user_1)
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+        # Проверка содержимого ответа
+        self.assertEqual(
+            response.json(),
+            {'id': self.sale_factory_1.pk, 'title': 'Завод 1', 'subtree_debt': '123.75', 'subtree_count': 3}
+        )
+
+
+class SaleBulkCreateTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Получение маршрутов
+        self.sale_bulk_url = '/sales/bulk/'
+
+        # Данные для создания цепочки объектов Sale одной пачкой
+        self.sale_bulk_data = [
+            {'title': 'Завод пачки', 'unit': 'Завод', 'product': self.product_1.pk,
+             'contact': self.contact_1.pk, 'sale_user': 'test@test.com', 'debt': '10.00'},
+            {'title': 'Розничная сеть пачки', 'unit': 'Розничная сеть', 'supplier_index': 0,
+             'product': self.product_1.pk, 'contact': self.contact_1.pk, 'sale_user': 'test@test.com',
+             'debt': '5.00'},
+            {'title': 'ИП пачки', 'unit': 'Индивидуальный предприниматель', 'supplier': self.sale_retail_1.pk,
+             'product': self.product_1.pk, 'contact': self.contact_1.pk, 'sale_user': 'test@test.com',
+             'debt': '1.50'},
+        ]
+
+    def test_user_cannot_bulk_create_oversized_batch(self):
+        """Пачка больше max_batch_size строк отклоняется целиком до проверки строк."""
+
+        with mock.patch.object(SaleBulkCreateListSerializer, 'max_batch_size', 2):
+            response = self.client.post(self.sale_bulk_url, self.sale_bulk_data, headers=self.headers_user_1,
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.json())
+        self.assertEqual(Sale.objects.count(), 6)
+
+    def test_user_can_bulk_create_sales_correctly(self):
+        """Активные пользователи могут создать пачку объектов Sale, ссылающихся друг на друга."""
+
+        # POST-запрос на создание пачки объектов
+        response = self.client.post(
+            self.sale_bulk_url,
+            self.sale_bulk_data,
+            headers=self.headers_user_1,
+            format='json'
+        )
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED
+        )
+
+        # Количество объектов после создания
+        self.assertEqual(Sale.objects.count(), 9)
+
+        # Проверка иерархии и сумм по поддеревьям
+        factory, retail, businessman = (Sale.objects.get(pk=sale['id']) for sale in response.json())
+        self.assertEqual(retail.supplier, factory)
+        self.assertEqual(retail.path, f'/{factory.pk}/')
+        self.assertEqual(retail.level, 1)
+        self.assertEqual(factory.subtree_debt, Decimal('15.00'))
+        self.assertEqual(businessman.level, 2)
+        self.sale_factory_1.refresh_from_db()
+        self.assertEqual(self.sale_factory_1.subtree_debt, Decimal('1.50'))
+        self.assertEqual(self.sale_factory_1.subtree_count, 4)
+
+    def test_negative_initial_debt_is_recorded_as_payment(self):
+        """Отрицательная начальная задолженность строки пачки записывается в журнал оплатой, как и при сохранении."""
+
+        self.sale_bulk_data[1]['debt'] = '-5.00'
+        response = self.client.post(self.sale_bulk_url, self.sale_bulk_data, headers=self.headers_user_1,
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        rows = {sale_id: (kind, amount) for sale_id, kind, amount in DebtTransaction.objects.values_list(
+            'sale_id', 'kind', 'amount')}
+        self.assertEqual(
+            [rows[sale['id']] for sale in response.json()],
+            [('charge', Decimal('10.00')), ('payment', Decimal('-5.00')), ('charge', Decimal('1.50'))]
+        )
+
+    def test_bulk_create_queries_do_not_depend_on_batch_size(self):
+        """Количество запросов при создании пачки не зависит от количества строк."""
+
+        # Данные для создания большой пачки объектов
+        data = self.sale_bulk_data * 20
+
+        # Запросы: пользователь, загрузка связей, транзакция, вставка по уровням, суммы по поддеревьям и журнал
+        with self.assertNumQueries(11):
+            response = self.client.post(self.sale_bulk_url, data, headers=self.headers_user_1, format='json')
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED
+        )
+
+    def test_user_gets_errors_for_each_row(self):
+        """При ошибках в строках пачки ни один объект не создается, а ошибки возвращаются по строкам."""
+
+        # Данные с ошибками во второй и третьей строках
+        self.sale_bulk_data[1]['unit'] = 'Завод'
+        self.sale_bulk_data[2]['contact'] = self.contact_2.pk
+
+        # POST-запрос на создание пачки объектов
+        response = self.client.post(
+            self.sale_bulk_url,
+            self.sale_bulk_data,
+            headers=self.headers_user_1,
+            format='json'
+        )
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+        # Количество объектов после запроса
+        self.assertEqual(Sale.objects.count(), 6)
+
+        # Проверка содержимого ответа
+        self.assertEqual(
+            response.json(),
+            [{},
+             {'supplier': ['Звено не может ссылаться на такой же тип звена.'],
+              'supplier_factory': ['Звено "Завод" не может ссылаться на другие звенья.']},
+             {'wrong_owner': ['Нельзя добавлять контакты чужих пользователей']}]
+        )
+
+
+class SaleDebtWriteOffTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Задолженности всех объектов
+        for sale in Sale.objects.all():
+            sale.debt = '10.00'
+            sale.save()
+
+        # Получение администратора
+        self.admin_user = User.objects.create(email='admin@test.com', is_staff=True, is_superuser=True)
+
+    def test_admin_action_writes_off_debt_in_background(self):
+        """Admin action создает задание, которое погашает задолженности выбранных объектов."""
+
+        # POST-запрос на выполнение admin action
+        self.client.force_login(self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/sales/sale/', {
+                'action': 'admin_action',
+                '_selected_action': [self.sale_factory_1.pk, self.sale_retail_1.pk],
+            })
+
+        # Проверка задания
+        job = DebtWriteOff.objects.get()
+        self.assertEqual(job.status, DebtWriteOff.Statuses.DONE)
+        self.assertEqual(job.processed, 2)
+
+        # Проверка задолженностей
+        self.assertEqual(
+            sorted(Sale.objects.filter(debt=0).values_list('pk', flat=True)),
+            sorted([self.sale_factory_1.pk, self.sale_retail_1.pk])
+        )
+
+    def test_interrupted_write_off_resumes_from_last_chunk(self):
+        """Прерванное задание продолжается с первого необработанного звена."""
+
+        # Задание, первая пачка которого уже обработана
+        sale_ids = sorted(Sale.objects.values_list('pk', flat=True))
+        job = DebtWriteOff.objects.create(sale_ids=sale_ids, total=len(sale_ids), processed=2,
+                                          last_pk=sale_ids[1], status=DebtWriteOff.Statuses.RUNNING)
+
+        # Прогресс задания давно не сохранялся
+        DebtWriteOff.objects.filter(pk=job.pk).update(updated=timezone.now() - timedelta(hours=1))
+
+        # Повторный запуск задания
+        write_off_debt(job.pk, chunk_size=3)
+
+        # Проверка задания
+        job.refresh_from_db()
+        self.assertEqual(job.status, DebtWriteOff.Statuses.DONE)
+        self.assertEqual(job.processed, 6)
+
+        # Проверка задолженностей
+        self.assertEqual(
+            list(Sale.objects.exclude(debt=0).order_by('pk').values_list('pk', flat=True)),
+            sale_ids[:2]
+        )
+
+    def test_running_write_off_is_not_resumed(self):
+        """Выполняющееся задание с недавним прогрессом не запускается повторно ни задачей, ни admin action."""
+
+        sale_ids = sorted(Sale.objects.values_list('pk', flat=True))
+        job = DebtWriteOff.objects.create(sale_ids=sale_ids, total=len(sale_ids), processed=2,
+                                          last_pk=sale_ids[1], status=DebtWriteOff.Statuses.RUNNING)
+
+        # Повторная доставка задачи
+        write_off_debt(job.pk, chunk_size=3)
+
+        # Admin action возобновления
+        self.client.force_login(self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/sales/debtwriteoff/', {
+                'action': 'resume_action',
+                '_selected_action': [job.pk],
+            })
+
+        # Проверка задания и задолженностей
+        job.refresh_from_db()
+        self.assertEqual(job.status, DebtWriteOff.Statuses.RUNNING)
+        self.assertEqual(job.processed, 2)
+        self.assertFalse(Sale.objects.filter(debt=0).exists())
+
+
+class SaleExportTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Звенья, которые выгружает первый пользователь
+        self.own_sales = Sale.objects.with_ownership().filter(sale_user=self.user_test, owners_match=True)
+
+    def test_user_can_export_sales_as_ndjson(self):
+        """Активные пользователи могут выгрузить свои объекты Sale в формате NDJSON."""
+
+        # GET-запрос на выгрузку объектов
+        response = self.client.get('/sales/export/ndjson/', headers=self.headers_user_1)
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+        # Проверка содержимого ответа
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), self.own_sales.count())
+        businessman = next(row for row in rows if row['id'] == self.sale_businessman_1.pk)
+        self.assertEqual(businessman['supplier_title'], 'Розничная сеть 1')
+        self.assertEqual(businessman['contact_city'], 'СПб')
+        self.assertEqual(businessman['debt'], '0.00')
+
+    def test_user_can_export_sales_as_csv(self):
+        """Активные пользователи могут выгрузить свои объекты Sale в формате CSV."""
+
+        # GET-запрос на выгрузку объектов
+        response = self.client.get('/sales/export/csv/', headers=self.headers_user_1)
+
+        # Проверка содержимого ответа
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:3], ['id', 'title', 'unit'])
+        self.assertEqual(len(rows), self.own_sales.count() + 1)
+
+    def test_user_exports_only_own_sales(self):
+        """Выгрузка содержит только звенья пользователя с его продуктом и контактом."""
+
+        response = self.client.get('/sales/export/ndjson/', headers=self.headers_user_2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        # Звено второго пользователя с чужими продуктом и контактом
+        Sale.objects.filter(pk=self.sale_factory_1.pk).update(sale_user=self.user_2)
+        response = self.client.get('/sales/export/ndjson/', headers=self.headers_user_2)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_export_negotiates_content_type(self):
+        """Выгрузка принимает заголовок Accept своего формата и возвращает 406 для других форматов."""
+
+        for export_format, accept in (('csv', 'text/csv'), ('ndjson', 'application/x-ndjson')):
+            headers = {**self.headers_user_1, 'Accept': accept}
+            response = self.client.get(f'/sales/export/{export_format}/', headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['Content-Type'].startswith(accept))
+
+        response = self.client.get('/sales/export/csv/', headers={**self.headers_user_1, 'Accept': 'application/json'})
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_export_reads_pages_without_server_side_cursors(self):
+        """При отключенных серверных курсорах выгрузка читает строки страницами по ключу и не теряет строки."""
+
+        expected = list(export_rows())
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            # Запросы: точка сохранения транзакции, три полные страницы, пустая страница и освобождение точки
+            with self.assertNumQueries(6):
+                rows = list(export_rows(chunk_size=2))
+        self.assertEqual(rows, expected)
+        self.assertEqual(len(rows), 6)
+
+    def test_user_cannot_export_sales_in_unknown_format(self):
+        """Выгрузка в неподдерживаемом формате возвращает ошибку 404."""
+
+        # GET-запрос на выгрузку объектов
+        response = self.client.get('/sales/export/xml/', headers=self.headers_user_1)
+
+        # Проверка статус кода
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+
+class SaleImportTestCase(SaleModelTestCase):
+    def write_csv(self, rows):
+        """Метод записывает строки во временный CSV-файл и возвращает путь к нему."""
+
+        file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8', newline='')
+        with file:
+            csv.writer(file).writerows(rows)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_importer_without_merge_cannot_be_created(self):
+        """Загрузчик, который не определяет перенос строк (merge), не создается."""
+
+        class IncompleteImporter(CsvImporter):
+            staging = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            IncompleteImporter()
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'Проверяется поведение для других СУБД.')
+    def test_import_requires_postgresql(self):
+        """Загрузка CSV без PostgreSQL завершается ошибкой команды."""
+
+        path = self.write_csv([['title', 'model', 'release', 'product_user']])
+        with self.assertRaises(CommandError):
+            call_command('import_csv', 'products', path)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'COPY поддерживается только PostgreSQL.')
+    def test_import_sales_with_in_file_suppliers(self):
+        """Звенья из файла создаются вместе с путями и суммами по поддеревьям, ошибочные строки отклоняются."""
+
+        path = self.write_csv([
+            ['ref', 'title', 'unit', 'supplier', 'supplier_ref', 'product', 'contact', 'sale_user', 'debt'],
+            ['r1', 'Сеть', 'Розничная сеть', self.sale_factory_1.pk, '', self.product_1.pk, 'test@test.com',
+             'test@test.com', '10.00'],
+            ['b1', 'ИП', 'Индивидуальный предприниматель', '', 'r1', self.product_1.pk, 'test@test.com',
+             'test@test.com', '5.50'],
+            ['b2', 'ИП чужой', 'Индивидуальный предприниматель', '', 'r1', self.product_2.pk, 'test@test.com',
+             'test@test.com', '1.00'],
+            ['b3', 'ИП глубже', 'Индивидуальный предприниматель', self.sale_businessman_1.pk, '',
+             self.product_1.pk, 'test@test.com', 'test@test.com', '1.00'],
+        ])
+        rejects = tempfile.NamedTemporaryFile('r', suffix='.csv', delete=False, encoding='utf-8')
+        self.addCleanup(os.remove, rejects.name)
+        call_command('import_csv', 'sales', path, rejects=rejects.name, stdout=open(os.devnull, 'w'))
+
+        # Проверка созданных объектов
+        retail = Sale.objects.get(title='Сеть')
+        businessman = Sale.objects.get(title='ИП')
+        self.assertEqual(retail.path, f'/{self.sale_factory_1.pk}/')
+        self.assertEqual(businessman.supplier_id, retail.pk)
+        self.assertEqual(businessman.level, 2)
+        self.assertEqual((retail.subtree_debt, retail.subtree_count), (Decimal('15.50'), 2))
+        self.sale_factory_1.refresh_from_db()
+        self.assertEqual(self.sale_factory_1.subtree_debt, Decimal('15.50'))
+        self.assertEqual(self.sale_factory_1.subtree_count, 5)
+
+        # Проверка отклоненных строк
+        with rejects:
+            rows = list(csv.reader(rejects))
+        self.assertEqual([row[0] for row in rows[1:]], ['4', '5'])
+
+
+class SaleRetrieveCacheTestCase(SaleModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.url = f'/sales/{self.sale_businessman_1.pk}/'
+
+    def test_retrieve_is_cached(self):
+        """Повторный запрос детальной информации не сериализует объект заново."""
+
+        # Первый запрос заполняет кэш
+        response = self.client.get(self.url, headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Повторный запрос читает только объект для проверки прав, пользователь берется из кэша аутентификации
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, headers=self.headers_user_1)
+        self.assertEqual(cached.json(), response.json())
+
+    def test_cached_retrieve_checks_permissions(self):
+        """Ответ из кэша не возвращается пользователям без доступа к объекту."""
+
+        self.client.get(self.url, headers=self.headers_user_1)
+        response = self.client.get(self.url, headers=self.headers_user_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cache_is_invalidated_by_supplier_product_and_contact(self):
+        """Изменение поставщика, продукта или контакта удаляет ответ звена из кэша."""
+
+        self.client.get(self.url, headers=self.headers_user_1)
+        self.sale_factory_1.title = 'Завод 1 (новый)'
+        self.sale_factory_1.save()
+        self.product_1.title = 'Антоновка'
+        self.product_1.save()
+        self.contact_1.city = 'Пушкин'
+        self.contact_1.save()
+
+        data = self.client.get(self.url, headers=self.headers_user_1).json()
+        self.assertEqual(data['supplier']['supplier']['title'], 'Завод 1 (новый)')
+        self.assertEqual(data['product']['title'], 'Антоновка')
+        self.assertEqual(data['contact']['city'], 'Пушкин')
+
+    def test_cache_is_invalidated_by_debt_write_off(self):
+        """Погашение задолженности удаляет ответ звена из кэша."""
+
+        Sale.objects.filter(pk=self.sale_retail_1.pk).update(debt=Decimal('7.00'))
+        cache.clear()
+        self.client.get(self.url, headers=self.headers_user_1)
+        Sale.objects.filter(pk=self.sale_retail_1.pk).write_off_debt()
+
+        data = self.client.get(self.url, headers=self.headers_user_1).json()
+        self.assertEqual(data['supplier']['debt'], '0.00')
+
+
+class SaleConditionalGetTestCase(SaleModelTestCase):
+    def test_unchanged_list_returns_not_modified(self):
+        """Повторный запрос списка с ETag без изменений возвращает ответ 304."""
+
+        etag = self.client.get('/sales/', headers=self.headers_user_1).headers['ETag']
+        response = self.client.get('/sales/', headers={**self.headers_user_1, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_supplier_change_updates_list_etag(self):
+        """Изменение поставщика меняет ETag списка его потомков, так как поставщик входит в представление звеньев."""
+
+        url = '/sales/?level=2'
+        etag = self.client.get(url, headers=self.headers_user_1).headers['ETag']
+        self.sale_factory_1.title = 'Завод 1 (новый)'
+        self.sale_factory_1.save()
+
+        response = self.client.get(url, headers={**self.headers_user_1, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class SaleOwnershipTestCase(SaleModelTestCase):
+    def test_object_permission_is_checked_in_one_query(self):
+        """Права на объект проверяются по признаку, вычисленному в запросе объекта, без загрузки связанных строк."""
+
+        # Запросы: пользователь и объект с признаком согласованности владельцев
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/sales/rollup/{self.sale_retail_1.pk}/', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_foreign_product_is_still_forbidden(self):
+        """Звено с продуктом чужого пользователя по-прежнему недоступно его владельцу (ошибка 403, а не 404)."""
+
+        response = self.client.get(f'/sales/rollup/{self.sale_retail_2.pk}/', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.patch(f'/sales/update/{self.sale_retail_2.pk}/', {'title': 'Сеть'},
+                                     headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SaleDebtLedgerTestCase(SaleModelTestCase):
+    def test_user_can_post_payment(self):
+        """Оплата уменьшает задолженность звена и суммы по поддеревьям его поставщиков и записывается в журнал."""
+
+        url = f'/sales/transactions/{self.sale_businessman_1.pk}/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'kind': 'charge', 'amount': '100.00'}, headers=self.headers_user_1)
+            response = self.client.post(url, {'kind': 'payment', 'amount': '30.00'}, headers=self.headers_user_1)
+
+        # Проверка статус кода и ответа
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED
+        )
+        self.assertEqual(response.json()['amount'], '-30.00')
+        self.assertEqual(response.json()['created_by'], 'test@test.com')
+
+        # Проверка задолженности и сумм по поддеревьям
+        self.sale_businessman_1.refresh_from_db()
+        self.sale_factory_1.refresh_from_db()
+        self.assertEqual(self.sale_businessman_1.debt, Decimal('70.00'))
+        self.assertEqual(self.sale_factory_1.subtree_debt, Decimal('70.00'))
+
+        # Проверка журнала
+        response = self.client.get(url, headers=self.headers_user_1)
+        self.assertEqual([row['kind'] for row in response.json()['results']], ['payment', 'charge'])
+
+    def test_rollups_are_propagated_after_commit(self):
+        """Проводка сразу изменяет задолженность звена, а суммы по поддеревьям поставщиков — задачей после фиксации
+        транзакции."""
+
+        DebtTransaction.post(self.sale_businessman_1.pk, 'charge', '100.00')
+        DebtTransaction.post(self.sale_retail_1.pk, 'charge', '20.00')
+        self.sale_businessman_1.refresh_from_db()
+        self.sale_factory_1.refresh_from_db()
+        self.assertEqual(self.sale_businessman_1.debt, Decimal('100.00'))
+        self.assertEqual(self.sale_factory_1.subtree_debt, Decimal('0.00'))
+
+        propagate_debt_rollups()
+        self.sale_factory_1.refresh_from_db()
+        self.sale_retail_1.refresh_from_db()
+        self.assertEqual(self.sale_factory_1.subtree_debt, Decimal('120.00'))
+        self.assertEqual(self.sale_retail_1.subtree_debt, Decimal('120.00'))
+        self.assertFalse(DebtTransaction.objects.filter(rolled_up=False).exists())
+
+    def test_rollups_follow_supplier_change_before_propagation(self):
+        """Операция, проведенная до переноса звена к другому поставщику, учитывается в суммах нового поставщика."""
+
+        DebtTransaction.post(self.sale_businessman_1.pk, 'charge', '100.00')
+        self.sale_businessman_1.refresh_from_db()
+        self.sale_businessman_1.supplier = self.sale_factory_1
+        self.sale_businessman_1.save()
+        propagate_debt_rollups()
+
+        self.sale_factory_1.refresh_from_db()
+        self.sale_retail_1.refresh_from_db()
+        self.assertEqual(self.sale_factory_1.subtree_debt, Decimal('100.00'))
+        self.assertEqual(self.sale_retail_1.subtree_debt, Decimal('0.00'))
+
+    def test_user_cannot_post_transactions_for_another_user(self):
+        """Пользователь не может проводить операции по чужим звеньям."""
+
+        response = self.client.post(f'/sales/transactions/{self.sale_businessman_1.pk}/',
+                                    {'kind': 'payment', 'amount': '1.00'}, headers=self.headers_user_2)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+
+    def test_amount_must_be_positive(self):
+        """Сумма операции вводится положительной."""
+
+        response = self.client.post(f'/sales/transactions/{self.sale_businessman_1.pk}/',
+                                    {'kind': 'payment', 'amount': '-1.00'}, headers=self.headers_user_1)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_balance_at_date_uses_snapshot_and_tail(self):
+        """Задолженность на дату равна балансу ближайшего снимка плюс операции после него."""
+
+        now = timezone.now()
+        DebtTransaction.objects.create(sale=self.sale_retail_1, kind='charge', amount=Decimal('50.00'),
+                                       created=now - timedelta(days=3))
+        DebtTransaction.objects.create(sale=self.sale_retail_1, kind='payment', amount=Decimal('-20.00'),
+                                       created=now - timedelta(days=2))
+        take_debt_snapshots()
+        DebtTransaction.objects.create(sale=self.sale_retail_1, kind='charge', amount=Decimal('5.00'), created=now)
+        self.assertEqual(DebtSnapshot.objects.get(sale=self.sale_retail_1).balance, Decimal('30.00'))
+
+        self.assertEqual(DebtTransaction.balance_at(self.sale_retail_1.pk, now), Decimal('35.00'))
+        self.assertEqual(DebtTransaction.balance_at(self.sale_retail_1.pk, now - timedelta(days=1)), Decimal('30.00'))
+        self.assertEqual(DebtTransaction.balance_at(self.sale_retail_1.pk, now - timedelta(days=3)), Decimal('50.00'))
+        self.assertEqual(DebtTransaction.balance_at(self.sale_retail_1.pk, now - timedelta(days=4)), Decimal('0'))
+
+        response = self.client.get(f'/sales/balance/{self.sale_retail_1.pk}/', headers=self.headers_user_1)
+        self.assertEqual(response.json()['debt'], '35.00')
+
+    def test_balance_at_invalid_date_returns_bad_request(self):
+        """Некорректная дата <at>, в том числе несуществующая, приводит к ошибке 400, а не 500."""
+
+        for value in ('2026-13-01T00:00:00', 'вчера'):
+            response = self.client.get(f'/sales/balance/{self.sale_retail_1.pk}/', {'at': value},
+                                       headers=self.headers_user_1)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_400_BAD_REQUEST
+            )
+            self.assertIn('at', response.json())
+
+    def test_debt_changes_are_recorded(self):
+        """Изменение задолженности при сохранении и погашение записываются в журнал."""
+
+        self.sale_retail_1.debt = Decimal('12.00')
+        self.sale_retail_1.save()
+        Sale.objects.filter(pk=self.sale_retail_1.pk).write_off_debt()
+
+        self.assertEqual(
+            list(self.sale_retail_1.debt_transactions.order_by('pk').values_list('kind', 'amount')),
+            [('charge', Decimal('12.00')), ('write_off', Decimal('-12.00'))]
+        )
+
+
+class SaleAsyncReadTestCase(SaleModelTestCase):
+    async def test_async_list_matches_sync_list(self):
+        """Асинхронный список объектов Sale совпадает с синхронным, включая фильтры по иерархии."""
+
+        url = f'?under={self.sale_factory_1.pk}'
+        expected = (await self.async_client.get(f'/sales/async/{url}', headers=self.headers_user_1)).json()
+        response = await sync_to_async(self.client.get)(f'/sales/{url}', headers=self.headers_user_1)
+        self.assertEqual(expected, response.json())
+        self.assertEqual(len(expected['results']), 2)
+
+    async def test_async_detail_matches_sync_detail(self):
+        """Асинхронная детальная информация совпадает с синхронной, права пользователя проверяются."""
+
+        url = f'{self.sale_businessman_1.pk}/'
+        response = await self.async_client.get(f'/sales/async/{url}', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = await sync_to_async(self.client.get)(f'/sales/{url}', headers=self.headers_user_1)
+        self.assertEqual(response.json(), expected.json())
+
+        response = await self.async_client.get(f'/sales/async/{url}', headers=self.headers_user_2)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_async_views_require_authentication(self):
+        """Асинхронные представления возвращают ошибку 401 без токена и с некорректным токеном."""
+
+        for url in ('/sales/async/', '/products/async/', f'/contacts/async/{self.contact_1.pk}/'):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            response = await self.async_client.get(url, headers={'Authorization': 'Bearer invalid'})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_views_answer_options(self):
+        """Синхронные обработчики, например OPTIONS, и неподдерживаемые методы обрабатываются асинхронным
+        представлением без ошибки 500."""
+
+        response = await self.async_client.options('/sales/async/', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('name', response.json())
+        response = await self.async_client.delete('/sales/async/', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_async_product_and_contact_reads(self):
+        """Асинхронные списки и детальная информация продуктов и контактов."""
+
+        response = await self.async_client.get('/products/async/', headers=self.headers_user_1)
+        self.assertEqual(len(response.json()), 2)
+        response = await self.async_client.get(f'/contacts/async/{self.contact_1.pk}/', headers=self.headers_user_1)
+        self.assertEqual(response.json()['contact_user'], 'test@test.com')
+        response = await self.async_client.get(f'/products/async/{self.product_2.pk}/', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SaleSparseFieldsetTestCase(SaleModelTestCase):
+    def test_list_returns_only_requested_fields(self):
+        """Список с параметром <fields> содержит только выбранные поля и не загружает поставщиков и контакты."""
+
+        # Запросы: пользователь, ETag списка и список объектов без присоединенных таблиц
+        with self.assertNumQueries(3):
+            response = self.client.get('/sales/?fields=id,title', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for sale in response.json()['results']:
+            self.assertEqual(set(sale), {'id', 'title'})
+
+    def test_detail_skips_omitted_fields_and_is_not_cached(self):
+        """Детальная информация с параметром <omit> не загружает пропущенные поля и не попадает в кэш."""
+
+        url = f'/sales/{self.sale_businessman_1.pk}/'
+
+        # Запросы: пользователь и объект без поставщиков, продукта и контакта
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{url}?omit=supplier,product,contact', headers=self.headers_user_1)
+        self.assertEqual(set(response.json()), {'id', 'title', 'unit', 'created', 'sale_user', 'debt'})
+        self.assertIsNone(cache.get(sale_cache_key(self.sale_businessman_1.pk)))
+
+        # Полный ответ попадает в кэш, а выбор полей сокращает ответ из кэша
+        full = self.client.get(url, headers=self.headers_user_1).json()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{url}?fields=id,supplier,debt', headers=self.headers_user_1)
+        self.assertEqual(response.json(), {'id': full['id'], 'supplier': full['supplier'], 'debt': full['debt']})
+
+
+class SaleRendererTestCase(SaleModelTestCase):
+    def test_orjson_renderer_matches_json_renderer(self):
+        """ORJSONRenderer кодирует ответ так же, как стандартный JSONRenderer, в том числе Decimal и даты."""
+
+        data = {
+            'debt': Decimal('10.50'),
+            'created': timezone.now(),
+            'results': self.client.get('/sales/', headers=self.headers_user_1).json()['results'],
+        }
+        expected = json.loads(JSONRenderer().render(data))
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), {**expected, 'debt': '10.50'})
+        self.assertTrue(expected['created'].endswith('Z'))
+
+    def test_indented_json_matches_json_renderer(self):
+        """Ответ с отступом (Accept: application/json; indent=N) формируется стандартным JSONRenderer."""
+
+        data = {**self.client.get('/sales/', headers=self.headers_user_1).json(), 'ratio': 1e-07, 'total': 1e16}
+        for indent in (2, 4):
+            media_type = f'application/json; indent={indent}'
+            self.assertEqual(ORJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+
+    def test_user_gets_json_by_default(self):
+        """Без заголовка Accept API отвечает в формате JSON."""
+
+        response = self.client.get(f'/sales/{self.sale_factory_1.pk}/', headers=self.headers_user_1)
+        self.assertEqual(response.headers['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['id'], self.sale_factory_1.pk)
+
+    def test_user_can_read_and_write_msgpack(self):
+        """Формат MessagePack выбирается заголовками Accept и Content-Type."""
+
+        headers = {**self.headers_user_1, 'Accept': 'application/msgpack'}
+        expected = self.client.get('/sales/', headers=self.headers_user_1).json()
+        response = self.client.get('/sales/', headers=headers)
+        self.assertEqual(response.headers['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        body = msgpack.packb({'title': 'Завод 3', 'unit': 'Завод', 'product': self.product_1.pk,
+                              'contact': self.contact_1.pk, 'sale_user': 'test@test.com', 'debt': '0.00'})
+        response = self.client.post('/sales/create/', body, content_type='application/msgpack', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(response.content)['title'], 'Завод 3')
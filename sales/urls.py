@@ -1,14 +1,24 @@
 from django.urls import path
 
 from sales.apps import SalesConfig
-from sales.views import SaleRetrieveAPIView, SaleCreateAPIView, SaleUpdateAPIView, SaleListAPIView, SaleDeleteAPIView
+from sales.views import (SaleRetrieveAPIView, SaleCreateAPIView, SaleUpdateAPIView, SaleListAPIView,
+                         SaleDeleteAPIView, SaleRollupAPIView, SaleBulkCreateAPIView, SaleExportAPIView,
+                         SaleDebtTransactionAPIView, SaleDebtBalanceAPIView, SaleListAsyncAPIView,
+                         SaleRetrieveAsyncAPIView)
 
 app_name = SalesConfig.name
 
 urlpatterns = [
     path('<int:pk>/', SaleRetrieveAPIView.as_view(), name='sales_list'),
     path('create/', SaleCreateAPIView.as_view(), name='sales_create'),
+    path('bulk/', SaleBulkCreateAPIView.as_view(), name='sales_bulk_create'),
     path('update/<int:pk>/', SaleUpdateAPIView.as_view(), name='sales_update'),
     path('', SaleListAPIView.as_view(), name='sales_list'),
-    path('delete/<int:pk>/', SaleDeleteAPIView.as_view(), name='sales_delete')
+    path('delete/<int:pk>/', SaleDeleteAPIView.as_view(), name='sales_delete'),
+    path('rollup/<int:pk>/', SaleRollupAPIView.as_view(), name='sales_rollup'),
+    path('export/<str:export_format>/', SaleExportAPIView.as_view(), name='sales_export'),
+    path('transactions/<int:pk>/', SaleDebtTransactionAPIView.as_view(), name='sales_transactions'),
+    path('balance/<int:pk>/', SaleDebtBalanceAPIView.as_view(), name='sales_balance'),
+    path('async/', SaleListAsyncAPIView.as_view(), name='sales_list_async'),
+    path('async/<int:pk>/', SaleRetrieveAsyncAPIView.as_view(), name='sales_detail_async'),
 ]
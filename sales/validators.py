@@ -1,3 +1,4 @@
+from django.db.models import Max
 from rest_framework import serializers
 
 
@@ -5,31 +6,45 @@ class SupplierValidator:
     """Валидирует поля <unit> и <supplier>. Если звено ссылает на аналогичный тип звена, то возбудится исключение.
     Поле <unit> типа <Завод> не может иметь поставщика, в ином случае возбудится исключение. Поля <unit>, тип которых
     отличны от <Завод> должны иметь поставщика, в ином случае возбудится исключение. Иерархичная структура данных должна
-    иметь не больше 3 уровней вложенности, иначе возбудится исключение."""
+    иметь не больше 3 уровней вложенности, иначе возбудится исключение. Уровень проверяется по полю <level> поставщика
+    без обхода цепочки; при переносе звена с потомками учитывается глубина его поддерева (наибольший <level> потомков).
+    Звено не может ссылаться на самого себя или на своего потомка."""
+
+    requires_context = True
 
     def __init__(self, unit, supplier):
         self.unit = unit
         self.supplier = supplier
 
-    def __call__(self, value):
+    def __call__(self, value, serializer):
         error = {}
-        counter = 0
         unit = value.get(self.unit)
         supplier = value.get(self.supplier)
+        instance = serializer.instance
         if supplier and unit == supplier.unit:
             error['supplier'] = 'Звено не может ссылаться на такой же тип звена.'
         if unit == 'Завод' and supplier:
             error['supplier_factory'] = 'Звено "Завод" не может ссылаться на другие звенья.'
         if unit != 'Завод' and not supplier:
             error['supplier_empty'] = 'Выберете поставщика.'
-        while supplier:
-            supplier = supplier.supplier
-            counter += 1
-        if counter >= 3:
+        if supplier and instance is not None and supplier.subtree_prefix.startswith(instance.subtree_prefix):
+            error['supplier_cycle'] = 'Звено не может ссылаться на себя или на своих потомков.'
+        elif supplier and supplier.level + 1 + self.get_subtree_depth(instance) > 2:
             error['count_supplier'] = 'Уровень вложенности не должен превышать 3.'
         if error:
             raise serializers.ValidationError(error)
 
+    @staticmethod
+    def get_subtree_depth(instance):
+        """Метод возвращает количество уровней потомков звена <instance> (0 для нового звена и звена без потомков)
+        одним агрегирующим запросом по индексу поля <path>."""
+
+        if instance is None or instance.pk is None:
+            return 0
+        deepest = type(instance).objects.filter(path__startswith=instance.subtree_prefix).aggregate(
+            level=Max('level'))['level']
+        return deepest - instance.level if deepest is not None else 0
+
 
 class ProductValidator:
     """Валидирует поля <product_user> и <sale_user>. Пользователь при создании объекта модели Sale не может ссылаться
@@ -1,10 +1,29 @@
-from rest_framework import generics
-from rest_framework.filters import SearchFilter
-from rest_framework.serializers import ValidationError
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import generics, status
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.serializers import DateTimeField, ValidationError
 
-from sales.models import Sale
+from config.async_views import AsyncAPIView, AsyncListModelMixin, AsyncRetrieveModelMixin
+from config.conditional import ConditionalListMixin
+from config.db_routers import use_primary
+from sales.caches import SALE_CACHE_TIMEOUT, sale_cache_key
+from sales.exporters import EXPORT_FORMATS, export_rows
+from sales.filters import SaleFilter, TrigramSearchFilter
+from sales.loaders import aload_suppliers
+from sales.models import Sale, DebtTransaction
+from sales.paginators import SaleCursorPagination, DebtTransactionPagination
 from sales.permissions import IsActiveAndIsOwner
-from sales.serializers import SaleSerializer, SaleRetrieveSerializer, SaleListSerializer
+from sales.renderers import CSVRenderer, NDJSONRenderer
+from sales.serializers import (SaleSerializer, SaleRetrieveSerializer, SaleListSerializer, SaleRollupSerializer,
+                               SaleBulkCreateSerializer, DebtTransactionSerializer, DebtBalanceSerializer)
+from users.authentication import CachedJWTAuthentication
 
 
 # Create your views here.
@@ -28,11 +47,62 @@ class SaleCreateAPIView(generics.CreateAPIView):
         new_mat.save()
 
 
+class SaleBulkCreateAPIView(generics.CreateAPIView):
+    """Для создания пачки объектов модели Sale одним запросом. Пачка проверяется целиком и сохраняется в одной
+    транзакции; если хотя бы одна строка содержит ошибки, не создается ни один объект."""
+
+    serializer_class = SaleBulkCreateSerializer
+    queryset = Sale.objects.all()
+    permission_classes = (IsActiveAndIsOwner,)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sales = serializer.save()
+        return Response(SaleSerializer(sales, many=True).data, status=status.HTTP_201_CREATED)
+
+
 class SaleRetrieveAPIView(generics.RetrieveAPIView):
-    """Для получения детальной информации об объекте модели Sale."""
+    """Для получения детальной информации об объекте модели Sale. Ответ хранится в кэше и удаляется из него
+    сигналами при изменении звена, его поставщиков, продукта или контакта. Права пользователя проверяются по объекту
+    из базы данных до того, как будет возвращен ответ из кэша. В кэш попадает только полный ответ: при выборе полей
+    (?fields=, ?omit=) ответ из кэша сокращается, а при промахе сериализуются и загружаются только выбранные поля.
+    Кэш заполняется данными основной базы данных: реплика может еще не получить изменение, из-за которого ответ был
+    удален из кэша."""
 
     serializer_class = SaleRetrieveSerializer
-    queryset = Sale.objects.all()
+    queryset = Sale.objects.with_ownership()
+    permission_classes = (IsActiveAndIsOwner,)
+
+    def get_queryset(self):
+        return self.serializer_class.select_related_for(super().get_queryset(), self.request)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        key = sale_cache_key(instance.pk)
+        data = cache.get(key)
+        if data is not None:
+            return Response(self.serializer_class.trim(data, request))
+        if self.serializer_class.is_sparse(request):
+            return Response(self.get_serializer(instance).data)
+        with use_primary():
+            if instance._state.db != DEFAULT_DB_ALIAS:
+                instance = self.get_object()
+            data = self.get_serializer(instance).data
+        cache.set(key, data, SALE_CACHE_TIMEOUT)
+        return Response(data)
+
+
+class SaleRollupAPIView(generics.RetrieveAPIView):
+    """Для получения задолженности и количества звеньев всей сети, которую снабжает объект модели Sale. Значения
+    хранятся в самом объекте, поэтому запрос не обходит иерархию."""
+
+    serializer_class = SaleRollupSerializer
+    queryset = Sale.objects.with_ownership()
     permission_classes = (IsActiveAndIsOwner,)
 
 
@@ -40,7 +110,7 @@ class SaleUpdateAPIView(generics.UpdateAPIView):
     """Для изменения информации об объекте модели Sale."""
 
     serializer_class = SaleSerializer
-    queryset = Sale.objects.all()
+    queryset = Sale.objects.with_ownership()
     permission_classes = (IsActiveAndIsOwner,)
 
     def perform_update(self, serializer):
@@ -56,19 +126,145 @@ class SaleUpdateAPIView(generics.UpdateAPIView):
         new_mat.save()
 
 
-class SaleListAPIView(generics.ListAPIView):
-    """Для получения информации обо всех объектах модели Sale."""
+class SaleListAPIView(ConditionalListMixin, generics.ListAPIView):
+    """Для получения информации обо всех объектах модели Sale. Изменения поставщиков и контактов отмечаются в поле
+    <updated_at> зависящих от них звеньев, поэтому для ETag достаточно полей самих звеньев."""
 
     serializer_class = SaleListSerializer
     queryset = Sale.objects.all()
     permission_classes = (IsActiveAndIsOwner,)
-    filter_backends = [SearchFilter, ]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter, OrderingFilter, ]
+    filterset_class = SaleFilter
     search_fields = ['contact__city', 'contact__country']
+    ordering_fields = ['level']
+    ordering = SaleCursorPagination.ordering
+    pagination_class = SaleCursorPagination
+
+    def get_queryset(self):
+        return self.serializer_class.select_related_for(super().get_queryset(), self.request)
 
 
 class SaleDeleteAPIView(generics.DestroyAPIView):
     """Для удаления объекта модели Sale."""
 
     serializer_class = SaleSerializer
-    queryset = Sale.objects.all()
+    queryset = Sale.objects.with_ownership()
+    permission_classes = (IsActiveAndIsOwner,)
+
+
+class SaleExportAPIView(generics.GenericAPIView):
+    """Для потоковой выгрузки объектов модели Sale текущего пользователя с названиями контакта, продукта и поставщика
+    в формате CSV или NDJSON. Выгружаются только звенья, детали которых пользователь может получить (см.
+    IsActiveAndIsOwner): его собственные, с его продуктом и контактом. Ответ формируется по мере чтения строк из базы
+    данных и не собирается в памяти целиком. База данных чтения выбирается при обработке запроса, так как строки
+    читаются уже после выхода из представления."""
+
+    queryset = Sale.objects.with_ownership()
     permission_classes = (IsActiveAndIsOwner,)
+    renderer_classes = (CSVRenderer, NDJSONRenderer)
+    swagger_schema = None
+
+    def get_format_suffix(self, **kwargs):
+        """Формат задается частью адреса <export_format>: согласование выбирает рендерер этого формата и возвращает
+        406, если заголовок Accept его не допускает."""
+
+        return kwargs.get('export_format')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(sale_user=self.request.user, owners_match=True)
+
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise NotFound(f'Формат выгрузки {export_format} не поддерживается.')
+        exporter, content_type = EXPORT_FORMATS[export_format]
+        queryset = self.get_queryset()
+        response = StreamingHttpResponse(exporter(export_rows(queryset.using(queryset.db))), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="sales.{export_format}"'
+        return response
+
+
+class SaleDebtTransactionAPIView(generics.ListCreateAPIView):
+    """Для получения журнала задолженности объекта модели Sale и проведения операций начисления, оплаты и списания.
+    Доступ определяется правами пользователя на само звено."""
+
+    serializer_class = DebtTransactionSerializer
+    permission_classes = (IsActiveAndIsOwner,)
+    filter_backends = []
+    pagination_class = DebtTransactionPagination
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.sale = get_object_or_404(Sale.objects.with_ownership(), pk=self.kwargs['pk'])
+        self.check_object_permissions(request, self.sale)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return DebtTransaction.objects.none()
+        return DebtTransaction.objects.filter(sale=self.sale).select_related('created_by')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sale'] = getattr(self, 'sale', None)
+        return context
+
+
+class SaleDebtBalanceAPIView(generics.RetrieveAPIView):
+    """Для получения задолженности объекта модели Sale на момент <at> (по умолчанию — текущий). Задолженность
+    вычисляется по ближайшему снимку и операциям журнала после него."""
+
+    serializer_class = DebtBalanceSerializer
+    queryset = Sale.objects.with_ownership()
+    permission_classes = (IsActiveAndIsOwner,)
+
+    def retrieve(self, request, *args, **kwargs):
+        sale = self.get_object()
+        moment = timezone.now()
+        if 'at' in request.query_params:
+            try:
+                moment = DateTimeField().to_internal_value(request.query_params['at'])
+            except ValidationError as exc:
+                raise ValidationError({'at': exc.detail})
+        balance = DebtTransaction.balance_at(sale.pk, moment)
+        return Response(self.get_serializer({'id': sale.pk, 'at': moment, 'debt': balance}).data)
+
+
+class SaleListAsyncAPIView(AsyncAPIView, SaleListAPIView, AsyncListModelMixin):
+    """Асинхронный вариант SaleListAPIView для ASGI-сервера: те же фильтры, сортировка, пагинация и ETag, все запросы
+    к базе данных выполняются асинхронно."""
+
+    authentication_classes = (CachedJWTAuthentication,)
+
+    async def get(self, request, *args, **kwargs):
+        await SaleFilter.aresolve(request)
+        return await self.alist(request, *args, **kwargs)
+
+    async def aprepare(self, objects):
+        if 'supplier' in self.serializer_class.get_requested_fields(self.request, self.serializer_class.Meta.fields):
+            await aload_suppliers(objects, self.serializer_class.related_fields)
+
+
+class SaleRetrieveAsyncAPIView(AsyncAPIView, SaleRetrieveAPIView, AsyncRetrieveModelMixin):
+    """Асинхронный вариант SaleRetrieveAPIView для ASGI-сервера с тем же кэшем ответов."""
+
+    authentication_classes = (CachedJWTAuthentication,)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        key = sale_cache_key(instance.pk)
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(self.serializer_class.trim(data, request))
+        if self.serializer_class.is_sparse(request):
+            if 'supplier' in self.serializer_class.get_requested_fields(request, self.serializer_class.Meta.fields):
+                await aload_suppliers([instance], self.serializer_class.related_fields)
+            return Response(self.get_serializer(instance).data)
+        with use_primary():
+            if instance._state.db != DEFAULT_DB_ALIAS:
+                instance = await self.aget_object()
+            await aload_suppliers([instance], self.serializer_class.related_fields)
+            data = self.get_serializer(instance).data
+        await cache.aset(key, data, SALE_CACHE_TIMEOUT)
+        return Response(data)
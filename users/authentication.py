@@ -0,0 +1,69 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.caches import aget_cached_user, get_cached_user
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """Аутентификация по JWT для асинхронных представлений. Токен проверяется без обращения к базе данных, а
+    пользователь загружается асинхронным запросом ORM. Проверки совпадают с JWTAuthentication, поэтому в синхронных
+    представлениях класс работает как обычный."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        return self.check_user(user, validated_token)
+
+    @staticmethod
+    def get_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    @staticmethod
+    def check_user(user, validated_token):
+        """Метод выполняет проверки пользователя из JWTAuthentication.get_user и возвращает его."""
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """Аутентификация по JWT с кэшем пользователей (users.caches): пользователь читается из кэша процесса, затем из
+    общего кэша и только при промахе из базы данных. Сохранение или удаление пользователя удаляет его из кэшей, поэтому
+    деактивация и смена пароля действуют в этом процессе сразу, а в остальных — не позже
+    AUTH_USER_LOCAL_CACHE_TIMEOUT секунд. Изменения через QuerySet.update() кэш не очищают."""
+
+    def get_user(self, validated_token):
+        user = get_cached_user(self.get_user_id(validated_token))
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user = await aget_cached_user(self.get_user_id(validated_token))
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        return self.check_user(user, validated_token)
@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import User
+
+
+def user_cache_key(pk):
+    """Ключ кэша полей объекта User."""
+
+    return f'users:auth:{pk}'
+
+
+class LocalUserCache:
+    """Кэш полей пользователей в памяти процесса: не больше <max_size> записей, вытесняются давно не
+    использованные, каждая запись живет <timeout> секунд. Сигнал сохранения пользователя очищает запись только в своем
+    процессе, поэтому время жизни записи ограничивает задержку, с которой изменение дойдет до остальных процессов."""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, pk):
+        with self.lock:
+            entry = self.entries.get(pk)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[pk]
+                return None
+            self.entries.move_to_end(pk)
+            return entry[1]
+
+    def set(self, pk, values):
+        with self.lock:
+            self.entries[pk] = (time.monotonic() + self.timeout, values)
+            self.entries.move_to_end(pk)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, pk):
+        with self.lock:
+            self.entries.pop(pk, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_users = LocalUserCache(settings.AUTH_USER_LOCAL_CACHE_SIZE, settings.AUTH_USER_LOCAL_CACHE_TIMEOUT)
+user_cache_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(result):
+    with _stats_lock:
+        user_cache_stats[result] += 1
+
+
+def _cached_fields():
+    """Функция возвращает кэшируемые поля пользователя. Хэш пароля кэшируется, только если токены проверяются по нему
+    (CHECK_REVOKE_TOKEN), иначе поле остается отложенным и загружается при обращении."""
+
+    check_password = getattr(api_settings, 'CHECK_REVOKE_TOKEN', False)
+    return [field for field in User._meta.concrete_fields if check_password or field.attname != 'password']
+
+
+def _to_values(user):
+    return tuple(field.get_prep_value(getattr(user, field.attname)) for field in _cached_fields())
+
+
+def _from_values(values):
+    return User.from_db(DEFAULT_DB_ALIAS, [field.attname for field in _cached_fields()], values)
+
+
+def get_cached_user(pk):
+    """Функция возвращает пользователя <pk> из кэша процесса, затем из общего кэша, затем из основной базы данных
+    (None, если пользователя нет; реплика могла бы вернуть в кэш еще не деактивированного пользователя). Результат
+    каждого обращения учитывается в user_cache_stats: local, shared или miss. Каждый вызов возвращает новый объект,
+    поэтому его можно изменять."""
+
+    values = local_users.get(pk)
+    if values is not None:
+        _count('local')
+        return _from_values(values)
+    values = cache.get(user_cache_key(pk))
+    if values is not None:
+        _count('shared')
+    else:
+        _count('miss')
+        user = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).first()
+        if user is None:
+            return None
+        values = _to_values(user)
+        cache.set(user_cache_key(pk), values, settings.AUTH_USER_CACHE_TIMEOUT)
+    local_users.set(pk, values)
+    return _from_values(values)
+
+
+async def aget_cached_user(pk):
+    """Асинхронный вариант get_cached_user."""
+
+    values = local_users.get(pk)
+    if values is not None:
+        _count('local')
+        return _from_values(values)
+    values = await cache.aget(user_cache_key(pk))
+    if values is not None:
+        _count('shared')
+    else:
+        _count('miss')
+        user = await User.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).afirst()
+        if user is None:
+            return None
+        values = _to_values(user)
+        await cache.aset(user_cache_key(pk), values, settings.AUTH_USER_CACHE_TIMEOUT)
+    local_users.set(pk, values)
+    return _from_values(values)
+
+
+def invalidate_user(pk):
+    """Функция удаляет пользователя <pk> из кэшей сразу и повторно после фиксации транзакции, чтобы параллельный
+    запрос не вернул в кэш данные, прочитанные до фиксации."""
+
+    def delete():
+        local_users.delete(pk)
+        cache.delete(user_cache_key(pk))
+
+    delete()
+    transaction.on_commit(delete)
+
+
+USER_DIRECTORY_VERSION_KEY = 'users:directory:version'
+
+
+def user_directory_cache_key(request):
+    """Ключ кэша страницы справочника пользователей. Страница одинакова для всех пользователей и зависит только от
+    адреса запроса: параметров поиска и пагинации, а также хоста, из которого строятся ссылки. В ключ входит версия
+    справочника, которую меняет invalidate_user_directory."""
+
+    version = cache.get_or_set(USER_DIRECTORY_VERSION_KEY, lambda: uuid4().hex, None)
+    digest = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+    return f'users:directory:{version}:{digest}'
+
+
+def invalidate_user_directory():
+    """Функция меняет версию справочника пользователей, после чего все закэшированные страницы перестают
+    использоваться и удаляются из кэша по истечении USER_DIRECTORY_CACHE_TIMEOUT. Версия меняется сразу и повторно
+    после фиксации транзакции, как в invalidate_user."""
+
+    def delete():
+        cache.delete(USER_DIRECTORY_VERSION_KEY)
+
+    delete()
+    transaction.on_commit(delete)
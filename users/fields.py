@@ -0,0 +1,51 @@
+from rest_framework import serializers
+
+from users.models import User
+
+
+class UserEmailField(serializers.SlugRelatedField):
+    """Поле пользователя по электронному адресу вместо SlugRelatedField(slug_field='email',
+    queryset=User.objects.all()). Варианты выбора не перечисляются ни в формах Browsable API, ни в метаданных, поле
+    отображается текстовым вводом. Адрес текущего пользователя разрешается без запроса к базе данных, а в списке
+    объектов (many=True) адреса всех строк загружаются одним запросом при первом обращении."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('slug_field', 'email')
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', User.objects.all())
+        kwargs.setdefault('style', {'base_template': 'input.html'})
+        super().__init__(**kwargs)
+
+    def get_choices(self, cutoff=None):
+        return {}
+
+    def iter_options(self):
+        return iter(())
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        user = getattr(self.context.get('request'), 'user', None)
+        if user is not None and user.is_authenticated and getattr(user, self.slug_field, None) == data:
+            return user
+        users = self.context.setdefault(f'users_by_{self.slug_field}', {})
+        if data not in users:
+            values = {data, *self.get_batch_values()} - users.keys()
+            users.update(dict.fromkeys(values))
+            users.update((getattr(obj, self.slug_field), obj)
+                         for obj in self.get_queryset().filter(**{f'{self.slug_field}__in': values}))
+        if users[data] is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return users[data]
+
+    def get_batch_values(self):
+        """Метод возвращает значения этого поля во всех строках входных данных списка объектов (many=True)."""
+
+        root = self.root
+        if not isinstance(root, serializers.ListSerializer) or self.parent is not root.child:
+            return []
+        rows = getattr(root, 'initial_data', None)
+        if not isinstance(rows, list):
+            return []
+        return [row[self.field_name] for row in rows
+                if isinstance(row, dict) and isinstance(row.get(self.field_name), str)]
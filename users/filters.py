@@ -0,0 +1,16 @@
+from rest_framework.filters import SearchFilter
+
+
+class EmailPrefixFilter(SearchFilter):
+    """Поиск пользователей по началу электронного адреса без учета регистра (параметр <q>). В PostgreSQL условие
+    обслуживает индекс users_user_email_upper_like, поэтому поиск не читает всю таблицу."""
+
+    search_param = 'q'
+    search_title = 'Начало электронного адреса'
+    search_description = 'Начало электронного адреса пользователя.'
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = request.query_params.get(self.search_param, '').strip()
+        if not prefix:
+            return queryset
+        return queryset.filter(email__istartswith=prefix)
@@ -0,0 +1,98 @@
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from PIL import Image, ImageOps
+
+AVATAR_THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def file_digest(file):
+    """Функция возвращает хэш SHA-256 содержимого файла, читая его частями."""
+
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedImageField(models.ImageField):
+    """Поле изображения, файл которого хранится под именем из хэша SHA-256 содержимого в каталоге <upload_to>:
+    одинаковые загрузки хранятся одним файлом. Если файл с таким содержимым уже сохранен, новый не записывается, и
+    поле ссылается на существующий. Поэтому файлы поля нельзя удалять вместе с объектом: на них могут ссылаться
+    другие объекты."""
+
+    def generate_filename(self, instance, filename):
+        digest = file_digest(getattr(instance, self.attname))
+        extension = posixpath.splitext(filename)[1].lower()
+        return self.storage.generate_filename(f'{self.upload_to}{digest[:2]}/{digest}{extension}')
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        if file and not file._committed:
+            name = self.generate_filename(model_instance, file.name)
+            if self.storage.exists(name):
+                file.name = name
+                file._committed = True
+                return file
+        return super().pre_save(model_instance, add)
+
+
+def thumbnail_name(digest, size, extension):
+    """Имя миниатюры определяется содержимым исходного файла (content-addressed): одинаковые аватарки разных
+    пользователей используют одни и те же файлы миниатюр."""
+
+    return f'users/thumbnails/{digest[:2]}/{digest}_{size}.{extension}'
+
+
+def make_thumbnail(file, size):
+    """Функция возвращает квадратную миниатюру <size>x<size> без метаданных (EXIF, ICC, XMP). Поворот из EXIF
+    применяется к пикселям до удаления метаданных. JPEG декодируется сразу в уменьшенном размере (draft), поэтому
+    большие фотографии не распаковываются целиком."""
+
+    with Image.open(file) as image:
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        mode = 'RGBA' if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info else 'RGB'
+        thumbnail = ImageOps.fit(image.convert(mode), (size, size), Image.Resampling.LANCZOS)
+    thumbnail.info.clear()
+    return thumbnail
+
+
+def encode_thumbnail(thumbnail, extension):
+    """Функция кодирует миниатюру в формат <extension> из AVATAR_THUMBNAIL_FORMATS. В JPEG прозрачный фон
+    заменяется белым."""
+
+    image_format, options = AVATAR_THUMBNAIL_FORMATS[extension]
+    if image_format == 'JPEG' and thumbnail.mode == 'RGBA':
+        background = Image.new('RGB', thumbnail.size, 'white')
+        background.paste(thumbnail, mask=thumbnail.getchannel('A'))
+        thumbnail = background
+    buffer = BytesIO()
+    thumbnail.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def store_avatar_thumbnails(file, size=None):
+    """Функция сохраняет миниатюры аватарки во всех форматах AVATAR_THUMBNAIL_FORMATS и возвращает их имена в
+    хранилище по расширениям. Уже сохраненные миниатюры того же содержимого не пересоздаются."""
+
+    size = size or settings.AVATAR_THUMBNAIL_SIZE
+    digest = file_digest(file)
+    names = {extension: thumbnail_name(digest, size, extension) for extension in AVATAR_THUMBNAIL_FORMATS}
+    missing = [extension for extension, name in names.items() if not default_storage.exists(name)]
+    if missing:
+        thumbnail = make_thumbnail(file, size)
+        for extension in missing:
+            content = ContentFile(encode_thumbnail(thumbnail, extension))
+            names[extension] = default_storage.save(names[extension], content)
+    return names
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+from django.db.models import F
+
+from users.models import User
+from users.tasks import make_avatar_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Постановка задач создания миниатюр для пользователей, аватарки которых еще не обработаны, например, '
+            'загруженных до появления миниатюр.')
+
+    def handle(self, *args, **options):
+        pending = (User.objects.exclude(avatar='').exclude(avatar__isnull=True).exclude(avatar=F('avatar_source'))
+                   .values_list('pk', flat=True).iterator())
+        count = 0
+        for pk in pending:
+            make_avatar_thumbnails.delay(pk)
+            count += 1
+        self.stdout.write(f'Поставлено задач: {count}')
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_email_prefix_index(apps, schema_editor):
+    """Создает индекс по выражению, которое Django использует для поиска <istartswith>. Класс операторов
+    text_pattern_ops позволяет выполнять LIKE 'префикс%' по индексу при любой сортировке (collation) базы данных.
+    Индекс нужен только в PostgreSQL, в остальных СУБД поиск выполняется без него."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS users_user_email_upper_like '
+        'ON users_user ((UPPER(email::text)) text_pattern_ops)'
+    )
+
+
+def drop_email_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS users_user_email_upper_like')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_prefix_index, drop_email_prefix_index),
+    ]
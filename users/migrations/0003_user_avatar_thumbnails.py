@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_email_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_small',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='', verbose_name='миниатюра аватарки (WebP)'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_small_jpeg',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='', verbose_name='миниатюра аватарки (JPEG)'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_source',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='аватарка, из которой созданы миниатюры'),
+        ),
+    ]
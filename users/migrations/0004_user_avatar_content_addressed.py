@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:43
+
+from django.db import migrations
+import users.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_avatar_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=users.images.ContentAddressedImageField(blank=True, null=True, upload_to='users/avatars/', verbose_name='аватарка'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from users.images import ContentAddressedImageField
+
 NULLABLE = {'null': True, 'blank': True}
 
 
@@ -37,7 +39,11 @@ class User(AbstractUser):
     email = models.EmailField(unique=True, max_length=150, verbose_name='электронная_почта')
     phone = models.CharField(max_length=30, verbose_name='номер_телефона', **NULLABLE)
     city = models.CharField(max_length=150, verbose_name='город', **NULLABLE)
-    avatar = models.ImageField(upload_to='users/', verbose_name='аватарка', **NULLABLE)
+    avatar = ContentAddressedImageField(upload_to='users/avatars/', verbose_name='аватарка', **NULLABLE)
+    avatar_small = models.ImageField(editable=False, verbose_name='миниатюра аватарки (WebP)', **NULLABLE)
+    avatar_small_jpeg = models.ImageField(editable=False, verbose_name='миниатюра аватарки (JPEG)', **NULLABLE)
+    avatar_source = models.CharField(max_length=100, editable=False, blank=True,
+                                     verbose_name='аватарка, из которой созданы миниатюры')
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
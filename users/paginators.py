@@ -0,0 +1,9 @@
+from config.pagination import KeysetPagination
+
+
+class UserDirectoryPagination(KeysetPagination):
+    """Пагинация справочника пользователей по ключу email: адрес уникален, поэтому однозначно задает порядок."""
+
+    ordering = ('email',)
+    page_size = 50
+    max_page_size = 500
@@ -4,11 +4,32 @@ from users.models import User
 
 
 class UserListSerializer(serializers.ModelSerializer):
+    """Краткая информация о пользователе для справочника. Поле <avatar> содержит миниатюру аватарки в WebP, поле
+    <avatar_jpeg> — в JPEG для клиентов без поддержки WebP. Пока миниатюры не созданы, оба поля содержат исходную
+    аватарку."""
+
+    avatar = serializers.SerializerMethodField()
+    avatar_jpeg = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ('id', 'email', 'first_name', 'city', 'avatar')
+        fields = ('id', 'email', 'first_name', 'city', 'avatar', 'avatar_jpeg')
         ref_name = 'UserListSerializer'
 
+    def get_avatar(self, obj):
+        return self.get_image_url(obj.avatar_small or obj.avatar)
+
+    def get_avatar_jpeg(self, obj):
+        return self.get_image_url(obj.avatar_small_jpeg or obj.avatar)
+
+    def get_image_url(self, file):
+        """Метод возвращает абсолютный адрес файла, как ImageField сериализатора, или None без файла."""
+
+        if not file:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(file.url) if request is not None else file.url
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
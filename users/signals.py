@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.caches import invalidate_user, invalidate_user_directory
+from users.models import User
+from users.tasks import make_avatar_thumbnails
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Удаляет пользователя из кэша аутентификации при любом сохранении, в том числе при деактивации и смене
+    пароля, и сбрасывает кэш справочника пользователей."""
+
+    invalidate_user(instance.pk)
+    invalidate_user_directory()
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_thumbnails(sender, instance, update_fields=None, **kwargs):
+    """Ставит задачу создания миниатюр после фиксации транзакции, если аватарка изменилась с момента создания
+    последних миниатюр."""
+
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if {'avatar', 'avatar_source'} & instance.get_deferred_fields():
+        return
+    if (instance.avatar.name or '') != instance.avatar_source:
+        transaction.on_commit(lambda: make_avatar_thumbnails.delay(instance.pk))
@@ -0,0 +1,32 @@
+from celery import shared_task
+from django.db.models import Q
+
+from users.caches import invalidate_user, invalidate_user_directory
+from users.images import store_avatar_thumbnails
+from users.models import User
+
+
+@shared_task
+def make_avatar_thumbnails(user_id):
+    """Создает миниатюры аватарки пользователя в WebP и JPEG, а если аватарка удалена — удаляет ссылки на миниатюры.
+    Результат сохраняется, только если аватарка не изменилась во время обработки: для новой аватарки уже поставлена
+    своя задача."""
+
+    user = User.objects.filter(pk=user_id).only('avatar', 'avatar_source').first()
+    if user is None:
+        return
+    source = user.avatar.name or ''
+    if source == user.avatar_source:
+        return
+    if source:
+        with user.avatar.open('rb') as file:
+            names = store_avatar_thumbnails(file)
+        unchanged = Q(avatar=source)
+    else:
+        names = {'webp': None, 'jpeg': None}
+        unchanged = Q(avatar='') | Q(avatar__isnull=True)
+    updated = User.objects.filter(unchanged, pk=user_id).update(
+        avatar_small=names['webp'], avatar_small_jpeg=names['jpeg'], avatar_source=source)
+    if updated:
+        invalidate_user(user_id)
+        invalidate_user_directory()
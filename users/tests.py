@@ -1,11 +1,28 @@
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import BytesIO
+
 from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 
+from config.media import media_urlpatterns
+from products.serializers import ProductSerializer
+from users.caches import local_users, user_cache_stats
 from users.models import User
 
 
 # Create your tests here.
+# Реплики для чтения в тестах отключены: данные тестов не зафиксированы и не видны соединению реплики
+@override_settings(DATABASE_REPLICAS=[])
 class UserModelTestCase(APITestCase):
     def setUp(self) -> None:
         # Получение маршрутов
@@ -449,3 +466,270 @@ class UserActionTestCase(UserModelTestCase):
             response.json(),
             {'detail': 'У вас недостаточно прав для выполнения данного действия.'}
         )
+
+
+class UserEmailFieldTestCase(UserModelTestCase):
+    def test_current_user_is_resolved_without_query(self):
+        """Адрес текущего пользователя разрешается без запроса к базе данных."""
+
+        request = APIRequestFactory().post('/')
+        request.user = self.user_test
+        serializer = ProductSerializer(data={'title': 'Lada', 'model': 'Granta', 'release': '2023-12-29',
+                                             'product_user': 'test@test.com'}, context={'request': request})
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid())
+        self.assertIs(serializer.validated_data['product_user'], self.user_test)
+
+    def test_emails_of_list_are_resolved_in_one_query(self):
+        """Адреса всех строк списка загружаются одним запросом, неизвестный адрес возвращает ошибку."""
+
+        rows = [{'title': 'Lada', 'model': 'Granta', 'release': '2023-12-29', 'product_user': email}
+                for email in ('test@test.com', 'another@test.com', 'inactive@test.com', 'test@test.com', 'no@test.com')]
+        serializer = ProductSerializer(data=rows, many=True)
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual([bool(error) for error in serializer.errors], [False, False, False, False, True])
+
+    def test_forms_do_not_list_users(self):
+        """Формы Browsable API не перечисляют пользователей."""
+
+        response = self.client.get('/products/', headers={**self.headers_user_1, 'Accept': 'text/html'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('name="product_user"', response.content.decode())
+        self.assertNotIn('another@test.com', response.content.decode())
+
+
+class UserDirectoryTestCase(UserModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.url = '/user/'
+
+    def test_users_are_paginated_by_email(self):
+        """Справочник выводится страницами по электронному адресу, ссылка next ведет на следующую страницу."""
+
+        response = self.client.get(self.url, {'page_size': 2}, headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['email'] for user in response.json()['results']],
+                         ['another@test.com', 'inactive@test.com'])
+        self.assertIn('avatar', response.json()['results'][0])
+
+        response = self.client.get(response.json()['next'], headers=self.headers_user_1)
+        self.assertEqual([user['email'] for user in response.json()['results']], ['test@test.com'])
+        self.assertIsNone(response.json()['next'])
+
+    def test_users_are_searched_by_email_prefix(self):
+        """Параметр q отбирает пользователей по началу адреса без учета регистра."""
+
+        response = self.client.get(self.url, {'q': 'IN'}, headers=self.headers_user_1)
+        self.assertEqual([user['email'] for user in response.json()['results']], ['inactive@test.com'])
+
+        response = self.client.get(self.url, {'q': 'test.com'}, headers=self.headers_user_1)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_page_is_shared_between_users(self):
+        """Страница, закэшированная для одного пользователя, возвращается другому без запросов к базе данных."""
+
+        self.client.get(self.url, headers=self.headers_user_2)
+        response = self.client.get(self.url, headers=self.headers_user_1)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, headers=self.headers_user_1)
+        self.assertEqual(cached.json(), response.json())
+
+    def test_page_is_invalidated_on_user_save(self):
+        """Сохранение пользователя сбрасывает кэш справочника."""
+
+        self.client.get(self.url, headers=self.headers_user_1)
+        self.user_2.first_name = 'Pavel'
+        self.user_2.save()
+        response = self.client.get(self.url, headers=self.headers_user_1)
+        self.assertEqual(response.json()['results'][0]['first_name'], 'Pavel')
+
+    def test_directory_requires_authentication(self):
+        """Справочник недоступен без аутентификации, в том числе из кэша."""
+
+        self.client.get(self.url, headers=self.headers_user_1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserAvatarThumbnailTestCase(UserModelTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        return super().tearDown()
+
+    @staticmethod
+    def make_photo():
+        """Фотография 400x300 с метаданными EXIF."""
+
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(buffer, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def upload_avatar(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar = self.make_photo()
+            user.save()
+        user.refresh_from_db()
+
+    def test_thumbnails_are_created_without_metadata(self):
+        """После загрузки аватарки создаются квадратные миниатюры в WebP и JPEG без EXIF."""
+
+        self.upload_avatar(self.user_test)
+        for field, image_format in (('avatar_small', 'WEBP'), ('avatar_small_jpeg', 'JPEG')):
+            with getattr(self.user_test, field).open('rb') as file, Image.open(file) as image:
+                self.assertEqual(image.format, image_format)
+                self.assertEqual(image.size, (128, 128))
+                self.assertFalse(image.getexif())
+        self.assertEqual(self.user_test.avatar_source, self.user_test.avatar.name)
+
+    def test_same_avatar_is_stored_once(self):
+        """Одинаковые аватарки разных пользователей хранятся одним файлом с именем по содержимому и используют одни
+        и те же файлы миниатюр."""
+
+        self.upload_avatar(self.user_test)
+        self.upload_avatar(self.user_2)
+        self.assertEqual(self.user_test.avatar.name, self.user_2.avatar.name)
+        self.assertRegex(self.user_test.avatar.name, r'^users/avatars/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(default_storage.listdir(os.path.dirname(self.user_test.avatar.name))[1]), 1)
+        self.assertEqual(self.user_test.avatar_small.name, self.user_2.avatar_small.name)
+        directory = os.path.dirname(self.user_test.avatar_small.name)
+        self.assertEqual(len(default_storage.listdir(directory)[1]), 2)
+
+    def test_directory_returns_thumbnails(self):
+        """Справочник пользователей возвращает миниатюры, а не исходную аватарку."""
+
+        self.upload_avatar(self.user_test)
+        response = self.client.get('/user/', {'q': 'test@'}, headers=self.headers_user_1)
+        user = response.json()['results'][0]
+        self.assertTrue(user['avatar'].endswith(self.user_test.avatar_small.url))
+        self.assertTrue(user['avatar_jpeg'].endswith(self.user_test.avatar_small_jpeg.url))
+
+    def test_thumbnails_are_removed_with_avatar(self):
+        """Удаление аватарки удаляет ссылки на миниатюры."""
+
+        self.upload_avatar(self.user_test)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_test.avatar = None
+            self.user_test.save()
+        self.user_test.refresh_from_db()
+        self.assertFalse(self.user_test.avatar_small)
+        self.assertFalse(self.user_test.avatar_small_jpeg)
+
+
+class MediaDeliveryTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.content = bytes(range(256)) * 4
+        default_storage.save('users/avatar.png', ContentFile(self.content))
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        return super().tearDown()
+
+    def test_file_is_served_with_cache_headers(self):
+        """Файл отдается целиком с заголовками кэширования, повторный запрос с ETag получает 304."""
+
+        response = self.client.get('/media/users/avatar.png')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        response = self.client.get('/media/users/avatar.png', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_byte_ranges(self):
+        """Запрос диапазона байтов получает 206, диапазон за пределами файла — 416, устаревший If-Range и
+        некорректный диапазон — файл целиком."""
+
+        response = self.client.get('/media/users/avatar.png', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+
+        response = self.client.get('/media/users/avatar.png', headers={'Range': 'bytes=-24'})
+        self.assertEqual(b''.join(response.streaming_content), self.content[-24:])
+
+        response = self.client.get('/media/users/avatar.png', headers={'Range': 'bytes=2000-'})
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        response = self.client.get('/media/users/avatar.png', headers={'Range': 'bytes=0-9', 'If-Range': '"old"'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Некорректный диапазон (конец раньше начала) игнорируется
+        response = self.client.get('/media/users/avatar.png', headers={'Range': 'bytes=5-3'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_paths_outside_media_root_are_not_served(self):
+        """Файлы за пределами MEDIA_ROOT и отсутствующие файлы возвращают 404."""
+
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/media/users/missing.png').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delivery_is_handed_to_web_server(self):
+        """В режимах x-accel-redirect и x-sendfile файл отдает веб-сервер, а неизменяемые миниатюры кэшируются на
+        год."""
+
+        with self.settings(MEDIA_DELIVERY='x-accel-redirect'):
+            response = self.client.get('/media/users/thumbnails/ab/ab_128.webp')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/users/thumbnails/ab/ab_128.webp')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        with self.settings(MEDIA_DELIVERY='x-sendfile'):
+            response = self.client.get('/media/users/avatar.png')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'users', 'avatar.png'))
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    def test_delivery_can_be_disabled(self):
+        """Без способа выдачи MEDIA_DELIVERY (по умолчанию без DEBUG) маршрут выдачи файлов не создается."""
+
+        with self.settings(MEDIA_DELIVERY=''):
+            self.assertEqual(media_urlpatterns(), [])
+        with self.settings(MEDIA_DELIVERY='django'):
+            self.assertEqual(len(media_urlpatterns()), 1)
+
+
+class UserAuthenticationCacheTestCase(UserModelTestCase):
+    def test_user_is_loaded_once_and_counted(self):
+        """Повторные запросы берут пользователя из кэша процесса, промахи и попадания учитываются."""
+
+        local_users.clear()
+        stats = user_cache_stats.copy()
+        self.client.get('/products/', headers=self.headers_user_1)
+
+        # Запросы: ETag и список продуктов, пользователь — из кэша процесса, затем из общего кэша
+        with self.assertNumQueries(2):
+            self.client.get('/products/', headers=self.headers_user_1)
+        local_users.clear()
+        with self.assertNumQueries(2):
+            self.client.get('/products/', headers=self.headers_user_1)
+        self.assertEqual(user_cache_stats - stats, Counter(miss=1, local=1, shared=1))
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        """Деактивация пользователя удаляет его из кэша, и следующий запрос отклоняется."""
+
+        self.client.get('/products/', headers=self.headers_user_1)
+        self.user_test.is_active = False
+        self.user_test.save()
+
+        response = self.client.get('/products/', headers=self.headers_user_1)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,13 +1,35 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from config.db_routers import use_primary
+from users.caches import user_directory_cache_key
+from users.filters import EmailPrefixFilter
 from users.models import User
+from users.paginators import UserDirectoryPagination
 from users.serializers import UserListSerializer
 
 
 # Create your views here.
 class UserListAPIView(generics.ListAPIView):
-    """Для получения объектов модели User."""
+    """Для получения объектов модели User. Справочник выводится страницами по ключу email, параметр <q> отбирает
+    пользователей по началу электронного адреса. Страницы одинаковы для всех пользователей, поэтому хранятся в общем
+    кэше USER_DIRECTORY_CACHE_TIMEOUT секунд и сбрасываются при сохранении любого пользователя. Кэш заполняется
+    данными основной базы данных, чтобы реплика не вернула в него уже измененного пользователя."""
+
     queryset = User.objects.all()
     serializer_class = UserListSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = UserDirectoryPagination
+    filter_backends = (EmailPrefixFilter,)
+
+    def list(self, request, *args, **kwargs):
+        key = user_directory_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            with use_primary():
+                data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, settings.USER_DIRECTORY_CACHE_TIMEOUT)
+        return Response(data)